@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+# Sentinel for a cache miss (None is a valid cached value)
+MISSING = object()
+
+
+def _json_default(value):
+    # Cached rows are dicts of plain column values; dates come back as ISO
+    # strings, which the endpoints' response models parse again
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class MemoryBackend:
+    """In-process LRU map with a per-entry TTL. Safe to share across threads."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared cache for several API workers/instances (needs the `redis` package).
+
+    Keys carry the mart version, so entries from an older version are never
+    read again and simply expire; clear() therefore does nothing. Values are
+    stored as JSON, never pickled: anyone who can write to Redis must not be
+    able to run code in the API.
+    """
+
+    def __init__(self, url, prefix="api-cache:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("API_CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return MISSING if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value, default=_json_default), ex=max(1, int(ttl)))
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+
+class NullBackend:
+    """Stores nothing (API_CACHE_BACKEND=none), e.g. to measure the database paths."""
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class ResponseCache:
+    """Caches crud results by function + arguments + mart version.
+
+    The mart version is the marker bumped at the end of the Dagster job
+    (scripts/publish_mart_version.py). It is re-read at most every
+    `version_check_interval` seconds; when it changes, the local backend is
+    cleared.
+    """
+
+    def __init__(self, backend, ttl=3600, version_check_interval=30):
+        self.backend = backend
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._version_checked_at = None
+        # Sync endpoints look values up from threadpool workers
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        backend_name = os.getenv("API_CACHE_BACKEND", "memory")
+        if backend_name == "redis":
+            backend = RedisBackend(os.getenv("API_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        elif backend_name == "memory":
+            backend = MemoryBackend(int(os.getenv("API_CACHE_MAX_ENTRIES", "1024")))
+        elif backend_name == "none":
+            backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown API_CACHE_BACKEND: {backend_name}")
+        return cls(
+            backend,
+            ttl=float(os.getenv("API_CACHE_TTL", "3600")),
+            version_check_interval=float(os.getenv("API_CACHE_VERSION_CHECK", "30")),
+        )
+
+    @property
+    def enabled(self):
+        return not isinstance(self.backend, NullBackend)
+
+    def version_is_stale(self):
+        return (self._version_checked_at is None
+                or time.monotonic() - self._version_checked_at >= self.version_check_interval)
+
+    def update_version(self, version):
+        if version != self.version:
+            self.backend.clear()
+            self.version = version
+        self._version_checked_at = time.monotonic()
+
+    def make_key(self, name, args, kwargs):
+        params = json.dumps([args, kwargs], default=str, sort_keys=True)
+        return f"{self.version}:{name}:{params}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._stats_lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "mart_version": self.version,
+        }
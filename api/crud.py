@@ -1,58 +1,204 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, cast, func, literal, or_, select, tuple_
+from sqlalchemy.exc import ProgrammingError
+from datetime import date, timedelta
+from typing import Optional, Tuple
 from . import models
-from collections import Counter
-import re
-from .models import FctMessage
 
+# Text search configuration used to build fct_messages.search_vector
+# (dbt var search_text_config); queries must be parsed with the same one
+SEARCH_TEXT_CONFIG = "english"
 
-def get_channel_activity(db: Session, channel_name: str):
+# Each query is built once as a select() and run by a sync function (psycopg2
+# Session) and an *_async twin (asyncpg AsyncSession) with the same arguments.
+
+
+def get_mart_version(db: Session):
+    """Current mart version marker, or None before the pipeline has published one."""
+    try:
+        return db.execute(select(models.MartVersion.version)).scalar()
+    except ProgrammingError:
+        db.rollback()
+        return None
+
+
+async def get_mart_version_async(db: AsyncSession):
+    try:
+        return (await db.execute(select(models.MartVersion.version))).scalar()
+    except ProgrammingError:
+        await db.rollback()
+        return None
+
+
+def channel_activity_query(channel_name: str):
+    day = func.date(models.FctMessage.message_timestamp).label("date")
     return (
-        db.query(func.date(models.FctMessage.message_timestamp).label("date"),
-                 func.count().label("message_count"))
-        .filter(models.FctMessage.channel_id == channel_name)
-        .group_by("date")
-        .order_by("date")
-        .all()
+        select(day, func.count().label("message_count"))
+        .where(models.FctMessage.channel_id == channel_name)
+        .group_by(day)
+        .order_by(day)
     )
 
 
-def search_messages(db: Session, query: str):
+def get_channel_activity(db: Session, channel_name: str):
+    return db.execute(channel_activity_query(channel_name)).all()
+
+
+async def get_channel_activity_async(db: AsyncSession, channel_name: str):
+    return (await db.execute(channel_activity_query(channel_name))).all()
+
+
+def search_messages_query(query: str, limit: int = 100, channel_name: Optional[str] = None,
+                          start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          after: Optional[Tuple[float, str, int]] = None):
+    """Ranked message search with keyset pagination.
+
+    Matches full-text (GIN on search_vector), fuzzy word similarity and plain
+    substrings (both served by the pg_trgm index on message_text), so
+    misspelled drug names still hit. Rows are ordered by rank, then
+    (channel_id, message_id); `after` is that triple for the last row of
+    the previous page.
+    """
+    message = models.FctMessage
+    tsquery = func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, query)
+    # ts_rank and word_similarity are float4; as float8 the rank survives the
+    # round trip through the JSON cursor exactly, so page boundaries are stable
+    rank = cast(func.ts_rank(message.search_vector, tsquery)
+                + func.word_similarity(query, message.message_text), Float(53)).label("rank")
+
+    ranked = (
+        select(message.message_id, message.message_timestamp, message.channel_id,
+               message.message_text, rank)
+        .where(or_(
+            message.search_vector.op("@@")(tsquery),
+            literal(query).op("<%")(message.message_text),
+            message.message_text.ilike(f"%{query}%"),
+        ))
+    )
+    if channel_name is not None:
+        ranked = ranked.where(message.channel_id == channel_name)
+    if start_date is not None:
+        ranked = ranked.where(message.message_timestamp >= start_date)
+    if end_date is not None:
+        ranked = ranked.where(message.message_timestamp < end_date + timedelta(days=1))
+
+    page = ranked.subquery()
+    results = select(page)
+    if after is not None:
+        results = results.where(tuple_(page.c.rank, page.c.channel_id, page.c.message_id) < tuple_(*after))
     return (
-        db.query(models.FctMessage)
-        .filter(models.FctMessage.message_text.ilike(f"%{query}%"))
-        .limit(100)
-        .all()
+        results.order_by(page.c.rank.desc(), page.c.channel_id.desc(), page.c.message_id.desc())
+        .limit(limit)
     )
 
 
-KNOWN_KEYWORDS = {
-    "cosmetics", "vucryl", "gloves", "ventilators", "syringe",
-    "wheelchair", "alcohol", "metoclorpromid", "forceps", "ibuprofen", "facemask"
-}
+def search_messages(db: Session, query: str, **filters):
+    return db.execute(search_messages_query(query, **filters)).all()
+
 
+async def search_messages_async(db: AsyncSession, query: str, **filters):
+    return (await db.execute(search_messages_query(query, **filters))).all()
 
-def clean_and_tokenize(text):
-    # Lowercase, remove non-letters, tokenize
-    text = text.lower()
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    return text.split()
 
+def top_keywords_query(limit: int = 10, start_date: Optional[date] = None,
+                       end_date: Optional[date] = None, channel_name: Optional[str] = None):
+    # Keyword counts are pre-aggregated per day and channel by the
+    # fct_keyword_mentions dbt model (keyword list: var known_keywords)
+    total = func.sum(models.FctKeywordMention.mention_count).label("count")
+    query = select(models.FctKeywordMention.keyword, total)
+    if start_date is not None:
+        query = query.where(models.FctKeywordMention.mention_date >= start_date)
+    if end_date is not None:
+        query = query.where(models.FctKeywordMention.mention_date <= end_date)
+    if channel_name is not None:
+        query = query.where(models.FctKeywordMention.channel_id == channel_name)
 
-def get_top_keywords(db, limit=10):
-    messages = (
-        db.query(FctMessage.message_text)
-        .filter(FctMessage.message_text != None)
-        .all()
+    return (
+        query.group_by(models.FctKeywordMention.keyword)
+        .order_by(total.desc(), models.FctKeywordMention.keyword)
+        .limit(limit)
     )
 
-    counter = Counter()
 
-    for (text,) in messages:
-        tokens = clean_and_tokenize(text)
-        if KNOWN_KEYWORDS:
-            tokens = [t for t in tokens if t in KNOWN_KEYWORDS]
-        counter.update(tokens)
+def get_top_keywords(db: Session, **filters):
+    top_keywords = db.execute(top_keywords_query(**filters)).all()
+    return [{"keyword": k, "count": c} for k, c in top_keywords]
 
-    top_keywords = counter.most_common(limit)
+
+async def get_top_keywords_async(db: AsyncSession, **filters):
+    top_keywords = (await db.execute(top_keywords_query(**filters))).all()
     return [{"keyword": k, "count": c} for k, c in top_keywords]
+
+
+def channel_detections_query(channel_name: str, limit: int = 10, start_date: Optional[date] = None,
+                             end_date: Optional[date] = None, weekday: Optional[bool] = None,
+                             order_by: str = "detections"):
+    # Served from the fct_channel_detections_daily rollup; dates are filtered
+    # through dim_dates so weekday/weekend slices come for free
+    rollup = models.FctChannelDetectionsDaily
+    detections = func.sum(rollup.detection_count).label("detection_count")
+    views = func.sum(rollup.view_count).label("view_count")
+    query = (
+        select(rollup.detected_object_class,
+               detections,
+               func.sum(rollup.message_count).label("message_count"),
+               (func.sum(rollup.confidence_sum) / func.sum(rollup.detection_count)).label("avg_confidence"),
+               views)
+        .join(models.DimChannel, models.DimChannel.channel_id == rollup.channel_id)
+        .join(models.DimDate, models.DimDate.date == rollup.detection_date)
+        .where(models.DimChannel.channel_id == channel_name)
+    )
+    if start_date is not None:
+        query = query.where(models.DimDate.date >= start_date)
+    if end_date is not None:
+        query = query.where(models.DimDate.date <= end_date)
+    if weekday is not None:
+        query = query.where(models.DimDate.is_weekday == weekday)
+
+    ranking = views if order_by == "views" else detections
+    return (
+        query.group_by(rollup.detected_object_class)
+        .order_by(ranking.desc(), rollup.detected_object_class)
+        .limit(limit)
+    )
+
+
+def get_channel_detections(db: Session, channel_name: str, **filters):
+    return db.execute(channel_detections_query(channel_name, **filters)).all()
+
+
+async def get_channel_detections_async(db: AsyncSession, channel_name: str, **filters):
+    return (await db.execute(channel_detections_query(channel_name, **filters))).all()
+
+
+def visual_content_query(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                         weekday: Optional[bool] = None):
+    # One row per channel from the fct_channel_images_daily rollup
+    rollup = models.FctChannelImagesDaily
+    images = func.sum(rollup.image_message_count)
+    pills = func.sum(rollup.pill_message_count)
+    query = (
+        select(models.DimChannel.channel_id,
+               images.label("image_message_count"),
+               func.sum(rollup.detected_message_count).label("detected_message_count"),
+               pills.label("pill_message_count"),
+               (pills / func.nullif(images, 0)).label("pill_detection_rate"))
+        .join(rollup, rollup.channel_id == models.DimChannel.channel_id)
+        .join(models.DimDate, models.DimDate.date == rollup.image_date)
+    )
+    if start_date is not None:
+        query = query.where(models.DimDate.date >= start_date)
+    if end_date is not None:
+        query = query.where(models.DimDate.date <= end_date)
+    if weekday is not None:
+        query = query.where(models.DimDate.is_weekday == weekday)
+    return query.group_by(models.DimChannel.channel_id).order_by(images.desc(), models.DimChannel.channel_id)
+
+
+def get_visual_content(db: Session, **filters):
+    return db.execute(visual_content_query(**filters)).all()
+
+
+async def get_visual_content_async(db: AsyncSession, **filters):
+    return (await db.execute(visual_content_query(**filters))).all()
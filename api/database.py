@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -9,6 +11,26 @@ load_dotenv('.env')
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Connection pool settings, shared by the sync and async engines
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+}
+
+# DB_ASYNC=true serves requests on an asyncpg engine instead of blocking
+# psycopg2 sessions in the threadpool
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+async_engine = None
+AsyncSessionLocal = None
+if USE_ASYNC_DB:
+    ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,142 @@
+import io
+import csv
+import json
+from datetime import date, datetime, timedelta
+from typing import Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from . import models
+from .database import SessionLocal
+
+# Rows fetched per server-side cursor round trip, and per output chunk
+EXPORT_CHUNK_SIZE = 5000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def messages_export_query(channel_name: Optional[str] = None, start_date: Optional[date] = None,
+                          end_date: Optional[date] = None):
+    message = models.FctMessage
+    columns = [c for c in message.__table__.columns if c.name != "search_vector"]
+    query = select(*columns)
+    if channel_name is not None:
+        query = query.where(message.channel_id == channel_name)
+    if start_date is not None:
+        query = query.where(message.message_timestamp >= start_date)
+    if end_date is not None:
+        query = query.where(message.message_timestamp < end_date + timedelta(days=1))
+    return query.order_by(message.channel_id, message.message_id)
+
+
+def image_detections_export_query(channel_name: Optional[str] = None, start_date: Optional[date] = None,
+                                  end_date: Optional[date] = None):
+    # fct_image_detections has no timestamp of its own; take it from the
+    # message the image was posted with. Message ids repeat across channels, so
+    # the join also matches the channel (parsed from relative_path by dbt)
+    detection = models.FctImageDetection
+    message = models.FctMessage
+    query = (
+        select(*detection.__table__.columns, message.message_timestamp)
+        .join(message, (detection.channel_id == message.channel_id)
+              & (detection.message_id == message.message_id))
+    )
+    if channel_name is not None:
+        query = query.where(detection.channel_id == channel_name)
+    if start_date is not None:
+        query = query.where(message.message_timestamp >= start_date)
+    if end_date is not None:
+        query = query.where(message.message_timestamp < end_date + timedelta(days=1))
+    return query.order_by(detection.channel_id, detection.message_id, detection.image_filename,
+                          detection.detected_object_class)
+
+
+def iter_row_chunks(query):
+    """Yield lists of row dicts from a server-side cursor, EXPORT_CHUNK_SIZE at a time.
+
+    Opens its own session: the response body is produced after the request's
+    dependencies have been torn down.
+    """
+    with SessionLocal() as db:
+        result = db.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_ndjson(query):
+    for rows in iter_row_chunks(query):
+        yield "".join(json.dumps(row, default=_json_default) + "\n" for row in rows)
+
+
+def stream_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in query.selected_columns])
+    for rows in iter_row_chunks(query):
+        writer.writerows(row.values() for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back out in chunks."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def arrow_schema(query):
+    arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_(),
+                   datetime: pa.timestamp("us"), date: pa.date32()}
+    return pa.schema([
+        (column.name, arrow_types.get(column.type.python_type, pa.string()))
+        for column in query.selected_columns
+    ])
+
+
+def stream_parquet(query):
+    """One Parquet row group per chunk; the footer is written after the last one."""
+    schema = arrow_schema(query)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in iter_row_chunks(query):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+STREAMERS = {
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+    "parquet": stream_parquet,
+}
@@ -1,27 +1,157 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, crud
-from .database import SessionLocal, engine
+import sys
+import json
+import time
+import base64
+from pathlib import Path
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import date
+from . import models, schemas, crud, export
+from .cache import MISSING, ResponseCache
+from .database import SessionLocal, AsyncSessionLocal
+
+# Stage metrics are shared with the pipeline scripts
+sys.path.append(str(Path(__file__).resolve().parents[1] / "scripts"))
+import instrumentation  # noqa: E402
 
 app = FastAPI()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Marts only change when the nightly pipeline publishes a new mart version
+cache = ResponseCache.from_env()
+
+# Dependency: an asyncpg session when DB_ASYNC is set, otherwise a psycopg2 one
+if AsyncSessionLocal is not None:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def call_db(db, sync_fn, async_fn, *args, **kwargs):
+    """Await the async crud function, or run the blocking one in the threadpool."""
+    if isinstance(db, AsyncSession):
+        return await async_fn(db, *args, **kwargs)
+    return await run_in_threadpool(sync_fn, db, *args, **kwargs)
+
+async def query_rows(db, sync_fn, async_fn, *args, **kwargs):
+    """Timed call_db, with rows converted to plain dicts."""
+    with instrumentation.timed("api_query", sync_fn.__name__):
+        results = await call_db(db, sync_fn, async_fn, *args, **kwargs)
+    return [row._asdict() if hasattr(row, "_asdict") else row for row in results]
+
+async def run_crud(db, sync_fn, async_fn, *args, **kwargs):
+    """query_rows through the response cache (API_CACHE_BACKEND=none skips it)."""
+    if not cache.enabled:
+        return await query_rows(db, sync_fn, async_fn, *args, **kwargs)
+    if cache.version_is_stale():
+        cache.update_version(await call_db(db, crud.get_mart_version, crud.get_mart_version_async))
+    key = cache.make_key(sync_fn.__name__, args, kwargs)
+    results = cache.get(key)
+    if results is MISSING:
+        instrumentation.count("api_cache", "misses")
+        results = await query_rows(db, sync_fn, async_fn, *args, **kwargs)
+        cache.set(key, results)
+    else:
+        instrumentation.count("api_cache", "hits")
+    return results
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Labelled by route template, so /api/channels/{channel_name}/activity is one series
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+    instrumentation.observe("api_request", f"{request.method} {endpoint}", time.perf_counter() - start)
+    instrumentation.count("api_request", f"status_{response.status_code // 100}xx")
+    return response
 
 @app.get("/api/channels/{channel_name}/activity", response_model=List[schemas.ChannelActivity])
-def channel_activity(channel_name: str, db: Session = Depends(get_db)):
-    return crud.get_channel_activity(db, channel_name)
+async def channel_activity(channel_name: str, db=Depends(get_db)):
+    return await run_crud(db, crud.get_channel_activity, crud.get_channel_activity_async, channel_name)
+
+def encode_cursor(row):
+    payload = json.dumps([row["rank"], row["channel_id"], row["message_id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        rank, channel_id, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), str(channel_id), int(message_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/api/search/messages", response_model=List[schemas.SearchResult])
-def search_messages(query: str, db: Session = Depends(get_db)):
-    return crud.search_messages(db, query)
+async def search_messages(response: Response, query: str, limit: int = Query(100, ge=1, le=500),
+                          channel: Optional[str] = None, start_date: Optional[date] = None,
+                          end_date: Optional[date] = None, cursor: Optional[str] = None,
+                          db=Depends(get_db)):
+    # A full page sets X-Next-Cursor; pass it back as `cursor` to fetch the next one
+    after = decode_cursor(cursor) if cursor else None
+    results = await run_crud(db, crud.search_messages, crud.search_messages_async, query,
+                             limit=limit, channel_name=channel, start_date=start_date,
+                             end_date=end_date, after=after)
+    if len(results) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(results[-1])
+    return results
 
 @app.get("/api/reports/top-products", response_model=List[schemas.KeywordCount])
-def top_products(limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_top_keywords(db, limit=limit)
+async def top_products(limit: int = 10, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       channel: Optional[str] = None, db=Depends(get_db)):
+    return await run_crud(db, crud.get_top_keywords, crud.get_top_keywords_async, limit=limit,
+                          start_date=start_date, end_date=end_date, channel_name=channel)
+
+@app.get("/api/channels/{channel_name}/detections", response_model=List[schemas.ClassDetections])
+async def channel_detections(channel_name: str, limit: int = Query(10, ge=1, le=100),
+                             start_date: Optional[date] = None, end_date: Optional[date] = None,
+                             weekday: Optional[bool] = None,
+                             order_by: Literal["detections", "views"] = "detections", db=Depends(get_db)):
+    # order_by=views ranks classes by the views of the messages they appear in
+    return await run_crud(db, crud.get_channel_detections, crud.get_channel_detections_async, channel_name,
+                          limit=limit, start_date=start_date, end_date=end_date, weekday=weekday,
+                          order_by=order_by)
+
+@app.get("/api/reports/visual-content", response_model=List[schemas.ChannelVisualContent])
+async def visual_content(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                         weekday: Optional[bool] = None, db=Depends(get_db)):
+    return await run_crud(db, crud.get_visual_content, crud.get_visual_content_async,
+                          start_date=start_date, end_date=end_date, weekday=weekday)
+
+def export_response(query, name: str, format: str):
+    # Streamed from a server-side cursor in fixed-size chunks; never cached
+    return StreamingResponse(
+        export.STREAMERS[format](query),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+@app.get("/api/export/messages")
+def export_messages(format: Literal["ndjson", "csv", "parquet"] = "ndjson", channel: Optional[str] = None,
+                    start_date: Optional[date] = None, end_date: Optional[date] = None):
+    query = export.messages_export_query(channel_name=channel, start_date=start_date, end_date=end_date)
+    return export_response(query, "fct_messages", format)
+
+@app.get("/api/export/image-detections")
+def export_image_detections(format: Literal["ndjson", "csv", "parquet"] = "ndjson", channel: Optional[str] = None,
+                            start_date: Optional[date] = None, end_date: Optional[date] = None):
+    query = export.image_detections_export_query(channel_name=channel, start_date=start_date, end_date=end_date)
+    return export_response(query, "fct_image_detections", format)
+
+@app.get("/api/cache/stats", response_model=schemas.CacheStats)
+def cache_stats():
+    return cache.stats()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus scrape target: request latency per route, query time per crud
+    # function and cache hits, plus process metrics
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,20 +1,78 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, Date, Float
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from .database import Base
 
 class FctMessage(Base):
     __tablename__ = "fct_messages"
     __table_args__ = {"schema": "dbt_telegram_mart"}
 
-    message_id = Column(Integer, primary_key=True)
+    message_id = Column(BigInteger, primary_key=True)
     message_timestamp = Column(DateTime)
     scrape_date = Column(Date)
-    channel_id = Column(String)
-    sender_id = Column(String)
+    channel_id = Column(String, primary_key=True)
+    sender_id = Column(BigInteger)
     message_text = Column(Text)
     view_count = Column(Integer)
     has_image = Column(Boolean)
     message_length = Column(Integer)
     loaded_at = Column(DateTime)
+    search_vector = deferred(Column(TSVECTOR))
+
+class FctImageDetection(Base):
+    __tablename__ = "fct_image_detections"
+    __table_args__ = {"schema": "dbt_telegram_mart"}
+
+    channel_id = Column(String, primary_key=True)
+    message_id = Column(BigInteger, primary_key=True)
+    detected_object_class = Column(String, primary_key=True)
+    confidence_score = Column(Float)
+    image_filename = Column(String, primary_key=True)
+    relative_path = Column(String)
+    processed_at = Column(DateTime)
+    loaded_at = Column(DateTime)
+
+class FctKeywordMention(Base):
+    __tablename__ = "fct_keyword_mentions"
+    __table_args__ = {"schema": "dbt_telegram_mart"}
+
+    mention_date = Column(Date, primary_key=True)
+    channel_id = Column(String, primary_key=True)
+    keyword = Column(String, primary_key=True)
+    mention_count = Column(Integer)
+    last_loaded_at = Column(DateTime)
+
+class FctChannelDetectionsDaily(Base):
+    __tablename__ = "fct_channel_detections_daily"
+    __table_args__ = {"schema": "dbt_telegram_mart"}
+
+    detection_date = Column(Date, primary_key=True)
+    channel_id = Column(String, primary_key=True)
+    detected_object_class = Column(String, primary_key=True)
+    detection_count = Column(BigInteger)
+    message_count = Column(BigInteger)
+    confidence_sum = Column(Float)
+    view_count = Column(BigInteger)
+    last_loaded_at = Column(DateTime)
+
+class FctChannelImagesDaily(Base):
+    __tablename__ = "fct_channel_images_daily"
+    __table_args__ = {"schema": "dbt_telegram_mart"}
+
+    image_date = Column(Date, primary_key=True)
+    channel_id = Column(String, primary_key=True)
+    image_message_count = Column(BigInteger)
+    detected_message_count = Column(BigInteger)
+    pill_message_count = Column(BigInteger)
+    last_loaded_at = Column(DateTime)
+
+class MartVersion(Base):
+    __tablename__ = "mart_version"
+    __table_args__ = {"schema": "dbt_telegram_mart"}
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger)
+    published_at = Column(DateTime)
 
 class DimChannel(Base):
     __tablename__ = "dim_channels"
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime, date
-from typing import List
+from typing import List, Optional
 
 class MessageOut(BaseModel):
     message_id: int
@@ -24,7 +24,30 @@ class SearchResult(BaseModel):
     message_timestamp: datetime
     channel_id: str
     message_text: str
+    rank: Optional[float] = None
 
 class KeywordCount(BaseModel):
     keyword: str
     count: int
+
+class ClassDetections(BaseModel):
+    detected_object_class: str
+    detection_count: int
+    message_count: int
+    avg_confidence: float
+    view_count: int
+
+class ChannelVisualContent(BaseModel):
+    channel_id: str
+    image_message_count: int
+    detected_message_count: int
+    pill_message_count: int
+    pill_detection_rate: Optional[float] = None
+
+class CacheStats(BaseModel):
+    backend: str
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    mart_version: Optional[int] = None
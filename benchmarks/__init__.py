@@ -0,0 +1,6 @@
+"""Performance benchmarks, each runnable as a script from the repository root.
+
+synthetic_data.py generates fake scraped data; pipeline_suite.py times every
+pipeline stage on it and saves the results as JSON. The other modules compare
+alternative implementations of a single stage.
+"""
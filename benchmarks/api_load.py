@@ -0,0 +1,141 @@
+"""Load-test the API in sync (psycopg2 threadpool) and async (asyncpg) database modes.
+
+Starts uvicorn once per mode with DB_ASYNC set accordingly, then drives the
+read endpoints with an increasing number of concurrent clients and reports
+requests/sec and latency per level. The response cache is off unless
+--cache-backend says otherwise: the same few URLs are requested over and
+over, so with it on every mode would just measure the cache. Run from the repository root with
+DATABASE_URL pointing at a loaded warehouse:
+
+    python benchmarks/api_load.py --concurrency 1 8 32 64 --duration 15
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+
+import aiohttp
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+from benchmarks.common import percentile  # noqa: E402
+
+ENDPOINTS = [
+    "/api/reports/top-products?limit=10",
+    "/api/channels/CheMed123/activity",
+    "/api/channels/lobelia4cosmetics/activity",
+    "/api/search/messages?query=paracetamol&limit=50",
+    "/api/search/messages?query=gloves&limit=50",
+]
+
+
+def start_server(mode, port, pool_size, max_overflow, cache_backend="none"):
+    env = dict(os.environ,
+               DB_ASYNC="true" if mode == "async" else "false",
+               DB_POOL_SIZE=str(pool_size),
+               DB_MAX_OVERFLOW=str(max_overflow),
+               API_CACHE_BACKEND=cache_backend)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env
+    )
+
+
+async def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/docs") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"API at {base_url} did not start within {timeout}s")
+
+
+async def client_loop(session, base_url, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        path = random.choice(ENDPOINTS)
+        began = time.perf_counter()
+        try:
+            async with session.get(base_url + path) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+        except aiohttp.ClientError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - began)
+
+
+async def run_level(base_url, concurrency, duration):
+    latencies = []
+    errors = []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        deadline = time.monotonic() + duration
+        began = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(session, base_url, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - began
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def benchmark_mode(mode, args):
+    server = start_server(mode, args.port, args.pool_size, args.max_overflow, args.cache_backend)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        await wait_until_ready(base_url)
+        await run_level(base_url, 1, 2)  # warm-up: open pool connections, plan caches
+        return [await run_level(base_url, level, args.duration) for level in args.concurrency]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64],
+                        help="Concurrent client counts to test")
+    parser.add_argument('--duration', type=float, default=15, help="Seconds per concurrency level")
+    parser.add_argument('--modes', nargs='+', choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument('--pool-size', type=int, default=10, help="DB_POOL_SIZE for the server")
+    parser.add_argument('--max-overflow', type=int, default=20, help="DB_MAX_OVERFLOW for the server")
+    parser.add_argument('--cache-backend', choices=["none", "memory", "redis"], default="none",
+                        help="API_CACHE_BACKEND for the server (none measures the database modes)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {mode: asyncio.run(benchmark_mode(mode, args)) for mode in args.modes}
+
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode, levels in results.items():
+        for r in levels:
+            print(f"{mode:<6} {r['concurrency']:7d} {r['requests_per_sec']:9.1f} "
+                  f"{r['p50_ms']:9.1f} {r['p99_ms']:9.1f} {r['errors']:7d}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
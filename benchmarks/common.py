@@ -0,0 +1,20 @@
+"""Helpers shared by the benchmark scripts."""
+
+# Words the synthetic messages are made of: product names (a few misspelled,
+# the way channels write them) plus common filler
+VOCABULARY = [
+    "cosmetics", "vucryl", "gloves", "ventilators", "syringe", "wheelchair", "alcohol",
+    "metoclorpromid", "forceps", "ibuprofen", "facemask", "paracetamol", "amoxicillin",
+    "available", "price", "birr", "call", "delivery", "new", "stock", "original", "box",
+    "tablets", "capsules", "cream", "lotion", "serum", "sunscreen", "vitamin", "supplement",
+    "hospital", "clinic", "pharmacy", "addis", "ababa", "bole", "order", "today", "quality",
+]
+
+
+def percentile(values, q):
+    """Nearest-rank q-th percentile of values (0.0 when empty)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
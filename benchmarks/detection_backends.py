@@ -0,0 +1,132 @@
+"""Compare PyTorch and ONNX Runtime inference of the detection models.
+
+Runs both backends over the same fixed, sorted set of scraped images and
+reports per-batch latency, throughput and how well the ONNX detections agree
+with the PyTorch ones. Run from the repository root:
+
+    python benchmarks/detection_backends.py --images 64 --batch-size 8 --int8
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import cv2
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+import image_detection as detection  # noqa: E402
+from benchmarks.common import percentile  # noqa: E402
+
+
+def load_fixed_images(limit):
+    paths = sorted(detection.BASE_IMAGE_DIR.rglob("*.jpg"))[:limit]
+    images = [cv2.imread(str(path)) for path in paths]
+    return [image for image in images if image is not None]
+
+
+def run_backend(backend, int8, images, batch_size):
+    """Return (per-batch latencies in seconds, per-image box lists) for one backend."""
+    models = detection.load_models(backend, int8)
+    general_model, pill_model = models
+
+    # Warm-up so session creation and first-call allocation are not timed
+    detection.run_models(models, images[:batch_size])
+
+    latencies = []
+    boxes = []
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        began = time.perf_counter()
+        results = detection.run_models(models, batch)
+        latencies.append(time.perf_counter() - began)
+        for results_general, results_pill in results:
+            boxes.append(
+                detection.extract_boxes(results_general, general_model.names)
+                + detection.extract_boxes(results_pill, pill_model.names, detection.PILL_CONFIDENCE_THRESHOLD)
+            )
+    return latencies, boxes
+
+
+def iou(a, b):
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    inter_w = max(0, min(ax2, bx2) - max(ax1, bx1))
+    inter_h = max(0, min(ay2, by2) - max(ay1, by1))
+    inter = inter_w * inter_h
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(reference, candidate, iou_threshold=0.5):
+    """F1 of candidate boxes against reference boxes, matching same-label boxes greedily by IoU."""
+    matched = total_reference = total_candidate = 0
+    for ref_boxes, cand_boxes in zip(reference, candidate):
+        total_reference += len(ref_boxes)
+        total_candidate += len(cand_boxes)
+        unmatched = list(cand_boxes)
+        for label, _, ref_xyxy in ref_boxes:
+            best = max(
+                (c for c in unmatched if c[0] == label),
+                key=lambda c: iou(ref_xyxy, c[2]),
+                default=None
+            )
+            if best is not None and iou(ref_xyxy, best[2]) >= iou_threshold:
+                matched += 1
+                unmatched.remove(best)
+    if total_reference + total_candidate == 0:
+        return 1.0
+    return 2 * matched / (total_reference + total_candidate)
+
+
+def summarize(name, latencies, image_count, batch_size):
+    total = sum(latencies)
+    return {
+        "backend": name,
+        "images": image_count,
+        "batch_size": batch_size,
+        "p50_batch_ms": percentile(latencies, 50) * 1000,
+        "p95_batch_ms": percentile(latencies, 95) * 1000,
+        "images_per_sec": image_count / total if total > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=64, help="Number of images in the fixed set")
+    parser.add_argument('--batch-size', type=int, default=detection.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--int8', action='store_true', help="Also benchmark the INT8-quantized ONNX export")
+    parser.add_argument('--output', type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    images = load_fixed_images(args.images)
+    if not images:
+        print(f"No images found under {detection.BASE_IMAGE_DIR}")
+        return 1
+
+    variants = [("torch", False), ("onnx", False)] + ([("onnx", True)] if args.int8 else [])
+    reference = None
+    results = []
+    for backend, int8 in variants:
+        name = f"{backend}-int8" if int8 else backend
+        latencies, boxes = run_backend(backend, int8, images, args.batch_size)
+        summary = summarize(name, latencies, len(images), args.batch_size)
+        if reference is None:
+            reference = boxes
+        summary["agreement_vs_torch"] = agreement(reference, boxes)
+        results.append(summary)
+
+    print(f"{'backend':<10} {'p50 ms':>9} {'p95 ms':>9} {'img/s':>8} {'agree':>7}")
+    for r in results:
+        print(f"{r['backend']:<10} {r['p50_batch_ms']:9.1f} {r['p95_batch_ms']:9.1f} "
+              f"{r['images_per_sec']:8.2f} {r['agreement_vs_torch']:7.1%}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
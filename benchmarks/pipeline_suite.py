@@ -0,0 +1,265 @@
+"""Benchmark the whole pipeline end to end on synthetic data.
+
+Generates a fake scraped tree (see synthetic_data.py), then times each stage
+against a local Postgres: the raw message loader and detection loader
+(rows/sec), YOLO detection (images/sec), the dbt run (per model), and the
+api/crud.py queries behind each endpoint (p50/p95/p99). Results are written
+as JSON; pass an earlier file as --baseline to print the change per metric.
+
+Loads into the raw schema and runs dbt against the configured target, so
+point .env (DB_* for the scripts, DATABASE_URL for the API) at a scratch
+database. Benchmark rows are cleared before each run. From the repository root:
+
+    python benchmarks/pipeline_suite.py --channels 5 --days 3 --messages 2000
+    python benchmarks/pipeline_suite.py --stages loaders api --baseline benchmarks/results/pipeline-<ts>.json
+"""
+import sys
+import json
+import time
+import argparse
+import itertools
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+from benchmarks.common import percentile  # noqa: E402
+from benchmarks.synthetic_data import CHANNEL_PREFIX, channel_names, generate_tree  # noqa: E402
+
+STAGES = ("loaders", "detection", "dbt", "api")
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+SEARCH_TERMS = ["paracetamol", "gloves", "vitamin supplement", "sunscren"]
+# The detection loader keys its progress on the store's file name, so the
+# benchmark store must not share the real one's
+BENCH_STORE_NAME = "bench_image_detections.jsonl"
+
+
+def clear_benchmark_rows():
+    """Delete earlier benchmark rows from the raw tables so every run loads from scratch."""
+    from load_raw_data import get_db_connection
+    channel = "split_part(relative_path, '/', 2) LIKE %(prefix)s"
+    statements = {
+        "raw.telegram_messages": "channel_name LIKE %(prefix)s",
+        "raw.load_manifest": channel,
+        "raw.image_detections": channel,
+        "raw.detection_load_state": "source_file = %(store)s",
+    }
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            for table, condition in statements.items():
+                cursor.execute("SELECT to_regclass(%s)", (table,))
+                if cursor.fetchone()[0] is not None:
+                    cursor.execute(f"DELETE FROM {table} WHERE {condition}",
+                                   {"prefix": CHANNEL_PREFIX.replace("_", r"\_") + "%", "store": BENCH_STORE_NAME})
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bench_message_loader(tree, batch_size, workers, counts):
+    from load_raw_data import load_scraped_data
+    start = time.perf_counter()
+    stats = load_scraped_data(str(tree), batch_size=batch_size, workers=workers)
+    elapsed = time.perf_counter() - start
+    return {
+        "files": stats["files"],
+        "messages": stats["messages"],
+        "failed_files": stats["failed_files"],
+        "seconds": elapsed,
+        "rows_per_sec": counts["messages"] / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def isolate_detection(detection, work_dir):
+    """Point image_detection at the synthetic tree and an empty store, cache and output folder."""
+    from detection_cache import DetectionCache
+    work_dir = Path(work_dir)
+    store_path = work_dir / BENCH_STORE_NAME
+    cache_path = work_dir / "detection_cache.sqlite"
+    # Left over from an earlier run in the same --work-dir; every run starts cold
+    for path in (store_path, cache_path, cache_path.with_name(f"{cache_path.name}-wal"),
+                 cache_path.with_name(f"{cache_path.name}-shm")):
+        path.unlink(missing_ok=True)
+    detection.BASE_IMAGE_DIR = work_dir / "telegram_messages"
+    detection.OUTPUT_JSON = store_path
+    detection.OUTPUT_IMG_DIR = work_dir / "detected_images"
+    detection.DetectionCache = partial(DetectionCache, path=cache_path)
+    return store_path
+
+
+def bench_detection(work_dir, counts, batch_size, backend, use_cache):
+    import image_detection as detection
+    store_path = isolate_detection(detection, work_dir)
+    start = time.perf_counter()
+    detections = detection.detect_objects(batch_size=batch_size, annotate=False, store_path=store_path,
+                                          use_cache=use_cache, backend=backend)
+    elapsed = time.perf_counter() - start
+    return store_path, {
+        "images": counts["images"],
+        "detections": detections,
+        "seconds": elapsed,
+        "images_per_sec": counts["images"] / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def bench_detection_loader(store_path, batch_size):
+    from load_detected_objects import load_detections
+    start = time.perf_counter()
+    inserted = load_detections(store_path, batch_size)
+    elapsed = time.perf_counter() - start
+    return {"detections": inserted, "seconds": elapsed,
+            "rows_per_sec": inserted / elapsed if elapsed > 0 else 0.0}
+
+
+def bench_dbt(full_refresh):
+    from dbt.cli.main import dbtRunner
+    command = ["run", "--project-dir", str(REPO_ROOT / "telegram_data")]
+    if full_refresh:
+        command.append("--full-refresh")
+    start = time.perf_counter()
+    result = dbtRunner().invoke(command)
+    elapsed = time.perf_counter() - start
+    if not result.success:
+        raise RuntimeError(f"dbt run failed: {result.exception}")
+    models = {
+        node.node.name: {
+            "seconds": node.execution_time,
+            "rows_affected": (node.adapter_response or {}).get("rows_affected"),
+        }
+        for node in result.result
+    }
+    return {"seconds": elapsed, "models": models}
+
+
+def api_cases(channel):
+    from api import crud
+    terms = itertools.cycle(SEARCH_TERMS)
+    return {
+        "channel_activity": lambda db: crud.get_channel_activity(db, channel),
+        "search_messages": lambda db: crud.search_messages(db, next(terms), limit=50),
+        "top_keywords": lambda db: crud.get_top_keywords(db, limit=10),
+        "channel_detections": lambda db: crud.get_channel_detections(db, channel),
+        "visual_content": lambda db: crud.get_visual_content(db),
+    }
+
+
+def bench_api(repeat):
+    """Latency of each endpoint's query, straight through api/crud.py (no HTTP or cache)."""
+    from api.database import SessionLocal
+    results = {}
+    with SessionLocal() as db:
+        for name, case in api_cases(channel_names(1)[0]).items():
+            case(db)  # warm-up
+            latencies = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                case(db)
+                latencies.append(time.perf_counter() - start)
+            results[name] = {
+                "queries": repeat,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+    return results
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1.0}} -> {"a.b": 1.0}, keeping numeric leaves only."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def print_comparison(baseline, current):
+    before, after = flatten(baseline["results"]), flatten(current["results"])
+    print(f"\n{'metric':<55} {'baseline':>12} {'current':>12} {'change':>8}")
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{metric:<55} {old:12.2f} {new:12.2f} {change:>8}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument('--channels', type=int, default=5)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=2000, help="Messages per channel per day")
+    parser.add_argument('--image-ratio', type=float, default=0.3)
+    parser.add_argument('--duplicate-image-rate', type=float, default=0.2)
+    parser.add_argument('--format', choices=("parquet", "jsonl", "json"), default="parquet",
+                        help="Message file format (see synthetic_data.py)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=5000, help="Rows per COPY batch in both loaders")
+    parser.add_argument('--workers', type=int, default=4, help="Parallel file loads in the message loader")
+    parser.add_argument('--detect-batch-size', type=int, default=8)
+    parser.add_argument('--backend', default="torch", help="Detection backend (torch or onnx)")
+    parser.add_argument('--no-cache', action='store_true', help="Disable the detection cache")
+    parser.add_argument('--full-refresh', action='store_true', help="Time a full dbt rebuild")
+    parser.add_argument('--repeat', type=int, default=50, help="Calls per API endpoint")
+    parser.add_argument('--work-dir', type=Path, help="Keep the synthetic tree here instead of a temp dir")
+    parser.add_argument('--output', type=Path, help="Results file (default: benchmarks/results/pipeline-<ts>.json)")
+    parser.add_argument('--baseline', type=Path, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    config = {key: value for key, value in vars(args).items() if key not in ("work_dir", "output", "baseline")}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="pipeline-bench-") as temp_dir:
+        work_dir = args.work_dir or Path(temp_dir)
+        tree = work_dir / "telegram_messages"
+        counts = generate_tree(tree, args.channels, args.days, args.messages, args.image_ratio,
+                               args.duplicate_image_rate, fmt=args.format, seed=args.seed)
+        clear_benchmark_rows()
+
+        if "loaders" in args.stages:
+            results["message_loader"] = bench_message_loader(tree, args.batch_size, args.workers, counts)
+        if "detection" in args.stages:
+            store_path, results["detection"] = bench_detection(work_dir, counts, args.detect_batch_size,
+                                                               args.backend, not args.no_cache)
+            if "loaders" in args.stages:
+                results["detection_loader"] = bench_detection_loader(store_path, args.batch_size)
+        if "dbt" in args.stages:
+            results["dbt"] = bench_dbt(args.full_refresh)
+        if "api" in args.stages:
+            results["api"] = bench_api(args.repeat)
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "config": config,
+        "data": counts,
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"pipeline-{started_at:%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        print_comparison(json.loads(args.baseline.read_text()), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Compare message search latency: the old ILIKE scan vs the indexed full-text/trigram search.
+
+Builds a synthetic fct_messages table (same columns and indexes as the dbt
+model) in a scratch schema, then times both query paths through SQLAlchemy
+with the API's models remapped onto that schema. Run from the repository
+root with DATABASE_URL pointing at a Postgres that has pg_trgm available:
+
+    python benchmarks/search_latency.py --messages 200000 --repeat 20
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from api import crud, models  # noqa: E402
+from api.database import engine  # noqa: E402
+from benchmarks.common import VOCABULARY, percentile  # noqa: E402
+
+BENCH_SCHEMA = "bench_search"
+MART_SCHEMA = models.FctMessage.__table_args__["schema"]
+
+QUERIES = [
+    "ibuprofen", "metoclorpromid", "metoclopramide", "gloves", "face mask",
+    "vitamin supplement", "sunscren", "wheelchair delivery",
+]
+
+
+def build_corpus(conn, message_count, text_config):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(f"""
+        CREATE TABLE {BENCH_SCHEMA}.fct_messages AS
+        SELECT
+            base.*,
+            LENGTH(message_text) AS message_length,
+            to_tsvector(:text_config, message_text) AS search_vector
+        FROM (
+            SELECT
+                g::BIGINT AS message_id,
+                NOW() - (g || ' minutes')::INTERVAL AS message_timestamp,
+                CURRENT_DATE AS scrape_date,
+                (ARRAY['CheMed123', 'lobelia4cosmetics', 'tikvahpharma'])[1 + g % 3] AS channel_id,
+                NULL::BIGINT AS sender_id,
+                (
+                    SELECT string_agg((CAST(:vocabulary AS TEXT[]))[1 + floor(random() * :vocabulary_size)::INT], ' ')
+                    FROM generate_series(1, 8 + g % 25)
+                ) AS message_text,
+                (random() * 5000)::INT AS view_count,
+                g % 4 = 0 AS has_image,
+                NOW() AS loaded_at
+            FROM generate_series(1, :message_count) AS g
+        ) base
+    """), {
+        "text_config": text_config,
+        "vocabulary": VOCABULARY,
+        "vocabulary_size": len(VOCABULARY),
+        "message_count": message_count,
+    })
+    conn.execute(text(f"""
+        CREATE UNIQUE INDEX ON {BENCH_SCHEMA}.fct_messages (channel_id, message_id);
+        CREATE INDEX ON {BENCH_SCHEMA}.fct_messages USING GIN (search_vector);
+        CREATE INDEX ON {BENCH_SCHEMA}.fct_messages USING GIN (message_text gin_trgm_ops);
+        ANALYZE {BENCH_SCHEMA}.fct_messages;
+    """))
+
+
+def ilike_search(db, query):
+    """The search path before full-text indexing: unranked ILIKE scan, first 100 rows."""
+    return (
+        db.query(models.FctMessage)
+        .filter(models.FctMessage.message_text.ilike(f"%{query}%"))
+        .limit(100)
+        .all()
+    )
+
+
+def indexed_search(db, query):
+    return crud.search_messages(db, query, limit=100)
+
+
+def time_path(db, search, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query in random.sample(QUERIES, len(QUERIES)):
+            start = time.perf_counter()
+            search(db, query)
+            latencies.append(time.perf_counter() - start)
+            db.expunge_all()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200_000, help="Synthetic messages to generate")
+    parser.add_argument('--repeat', type=int, default=20, help="Passes over the query set per path")
+    parser.add_argument('--keep', action='store_true', help=f"Keep the {BENCH_SCHEMA} schema afterwards")
+    parser.add_argument('--output', type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"Generating {args.messages} messages in {BENCH_SCHEMA}...")
+    with engine.begin() as conn:
+        build_corpus(conn, args.messages, crud.SEARCH_TEXT_CONFIG)
+
+    bench_engine = engine.execution_options(schema_translate_map={MART_SCHEMA: BENCH_SCHEMA})
+    results = {}
+    with Session(bind=bench_engine) as db:
+        for name, search in (("ilike", ilike_search), ("indexed", indexed_search)):
+            search(db, QUERIES[0])  # warm-up
+            latencies = time_path(db, search, args.repeat)
+            results[name] = {
+                "queries": len(latencies),
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+
+    print(f"{'path':<10} {'queries':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['queries']:8d} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f}")
+
+    if not args.keep:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+
+    if args.output:
+        args.output.write_text(json.dumps({"messages": args.messages, "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
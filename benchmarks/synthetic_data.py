@@ -0,0 +1,153 @@
+"""Generate a fake scraped-Telegram tree for benchmarking the pipeline.
+
+Writes the same layout the scraper produces, one folder per day and
+channel, with message segments (or legacy JSON arrays) and JPEG photos:
+
+    <root>/<YYYY-MM-DD>/<channel>/<channel>-<run id>.parquet
+    <root>/<YYYY-MM-DD>/<channel>/images/<message_id>.jpg
+
+Output is deterministic for a given --seed. Run from the repository root:
+
+    python benchmarks/synthetic_data.py data/bench --channels 5 --days 3 --messages 2000
+"""
+import sys
+import json
+import random
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+from benchmarks.common import VOCABULARY  # noqa: E402
+from message_segments import SEGMENT_FORMATS, segment_path, write_segment  # noqa: E402
+
+# Channel folders all start with this, so benchmark rows are easy to find
+# (and delete) in the raw tables
+CHANNEL_PREFIX = "bench_channel_"
+DEFAULT_START_DATE = date(2020, 1, 1)
+
+
+def channel_names(count):
+    return [f"{CHANNEL_PREFIX}{index:02d}" for index in range(1, count + 1)]
+
+
+def make_image(rng, size):
+    """A noisy background with a few filled shapes, JPEG-encoded."""
+    image = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), 8)
+    for _ in range(int(rng.integers(1, 6))):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x, y = (int(v) for v in rng.integers(0, size, 2))
+        radius = int(rng.integers(size // 20, size // 5))
+        if rng.random() < 0.5:
+            cv2.circle(image, (x, y), radius, color, -1)
+        else:
+            cv2.rectangle(image, (x - radius, y - radius), (x + radius, y + radius), color, -1)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        raise RuntimeError("Could not encode a synthetic image")
+    return encoded.tobytes()
+
+
+def make_message(rng, channel, message_id, posted_at):
+    words = rng.choice(VOCABULARY, size=int(rng.integers(5, 40)))
+    return {
+        'channel': f"@{channel}",
+        'message_id': message_id,
+        'sender_id': int(rng.integers(10**9, 10**10)),
+        'message_content': " ".join(words),
+        'timestamp': posted_at.isoformat(),
+        'views': int(rng.integers(0, 20000)),
+    }
+
+
+def write_messages(channel_dir, channel, messages, fmt):
+    if fmt == "json":
+        # The single-array <channel>.json files written before segments
+        with open(channel_dir / f"{channel}.json", 'w', encoding='utf-8') as f:
+            json.dump(messages, f, ensure_ascii=False, indent=2)
+    else:
+        write_segment(segment_path(str(channel_dir), channel, "bench", fmt), messages)
+
+
+def generate_tree(root, channels=5, days=3, messages_per_day=2000, image_ratio=0.3,
+                  duplicate_image_rate=0.2, image_size=640, start_date=DEFAULT_START_DATE,
+                  fmt="parquet", seed=0):
+    """Write the synthetic tree below root and return its counts.
+
+    Each channel posts messages_per_day messages a day, spread over the day;
+    image_ratio of them carry a photo. duplicate_image_rate of those photos
+    repeat an earlier photo byte for byte, the way reposted product shots do.
+    """
+    root = Path(root)
+    rng = np.random.default_rng(seed)
+    picker = random.Random(seed)
+    image_pool = []
+    counts = {"days": days, "channels": channels, "messages": 0, "images": 0, "duplicate_images": 0,
+              "message_bytes": 0, "image_bytes": 0}
+
+    for day_offset in range(days):
+        day = start_date + timedelta(days=day_offset)
+        day_start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        for channel in channel_names(channels):
+            channel_dir = root / day.isoformat() / channel
+            image_dir = channel_dir / "images"
+            image_dir.mkdir(parents=True, exist_ok=True)
+
+            # Like Telegram, every channel numbers its own messages from 1, so the
+            # same ids appear in every channel and joins must match the channel too
+            first_id = 1 + day_offset * messages_per_day
+            seconds = np.sort(rng.integers(0, 86400, messages_per_day))
+            messages = []
+            for offset, second in enumerate(seconds):
+                message = make_message(rng, channel, first_id + offset, day_start + timedelta(seconds=int(second)))
+                if rng.random() < image_ratio:
+                    if image_pool and rng.random() < duplicate_image_rate:
+                        data = picker.choice(image_pool)
+                        counts["duplicate_images"] += 1
+                    else:
+                        data = make_image(rng, image_size)
+                        image_pool.append(data)
+                    image_path = image_dir / f"{message['message_id']}.jpg"
+                    image_path.write_bytes(data)
+                    message['image_path'] = str(image_path)
+                    counts["images"] += 1
+                    counts["image_bytes"] += len(data)
+                messages.append(message)
+
+            write_messages(channel_dir, channel, messages, fmt)
+            counts["messages"] += len(messages)
+            counts["message_bytes"] += sum(path.stat().st_size for path in channel_dir.glob(f"{channel}*"))
+        print(f"Generated {day.isoformat()}: {channels} channels x {messages_per_day} messages")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('root', type=Path, help="Directory to write the <date>/<channel>/ tree into")
+    parser.add_argument('--channels', type=int, default=5)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=2000, help="Messages per channel per day")
+    parser.add_argument('--image-ratio', type=float, default=0.3, help="Share of messages with a photo")
+    parser.add_argument('--duplicate-image-rate', type=float, default=0.2,
+                        help="Share of photos that repeat an earlier photo exactly")
+    parser.add_argument('--image-size', type=int, default=640, help="Width and height of generated photos")
+    parser.add_argument('--start-date', type=date.fromisoformat, default=DEFAULT_START_DATE)
+    parser.add_argument('--format', choices=SEGMENT_FORMATS + ("json",), default="parquet",
+                        help="Message file format (json is the pre-segment single-array file)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate_tree(args.root, args.channels, args.days, args.messages, args.image_ratio,
+                           args.duplicate_image_rate, args.image_size, args.start_date, args.format, args.seed)
+    print(json.dumps(counts, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import os
+import argparse
+from message_segments import SEGMENT_FORMATS, compact_channel_dir
+
+RAW_DIR = os.path.join('data', 'raw', 'telegram_messages')
+
+# Segments younger than this may still be rewritten by a running scrape
+DEFAULT_MIN_AGE = 600
+
+
+def compact_segments(raw_dir=RAW_DIR, scrape_date=None, min_age=DEFAULT_MIN_AGE, fmt="parquet"):
+    """Merge each channel-day's segments under raw_dir (or only its scrape_date folder) into one.
+
+    Returns {"<date>/<channel>": segments merged} for the folders that were compacted.
+    """
+    dates = [scrape_date] if scrape_date else sorted(os.listdir(raw_dir)) if os.path.isdir(raw_dir) else []
+    compacted = {}
+    for date_folder in dates:
+        date_dir = os.path.join(raw_dir, date_folder)
+        if not os.path.isdir(date_dir):
+            continue
+        for channel_clean in sorted(os.listdir(date_dir)):
+            merged = compact_channel_dir(os.path.join(date_dir, channel_clean), channel_clean, min_age, fmt)
+            if merged:
+                compacted[f"{date_folder}/{channel_clean}"] = merged
+    return compacted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge each channel-day's small message segments into one")
+    parser.add_argument('--date', default=None, help="Only compact this day's folder (YYYY-MM-DD)")
+    parser.add_argument('--min-age', type=int, default=DEFAULT_MIN_AGE,
+                        help="Leave segments modified in the last N seconds alone")
+    parser.add_argument('--format', choices=SEGMENT_FORMATS, default="parquet",
+                        help="File format of the compacted segment")
+    args = parser.parse_args()
+
+    compacted = compact_segments(scrape_date=args.date, min_age=args.min_age, fmt=args.format)
+    for folder, merged in compacted.items():
+        print(f"Compacted {merged} segments in {folder}")
+    print(f"Compacted {len(compacted)} channel folders.")
@@ -1,10 +1,17 @@
 import os
 import json
+import asyncio
 import logging
-from datetime import datetime
+import argparse
+import time
+import backoff
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.tl.types import MessageMediaPhoto
+import instrumentation
+from message_segments import SEGMENT_FORMATS, new_run_id, read_message_ids, segment_path, write_segment
 
 load_dotenv('.env')
 api_id = os.getenv('TG_API_ID')
@@ -17,43 +24,212 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s %(message)s'
 )
 
+RAW_DIR = os.path.join('data', 'raw', 'telegram_messages')
+STATE_DIR = os.path.join('data', 'raw', 'scrape_state')
+
+# List of channels to scrape
+CHANNELS = [
+    '@CheMed123',
+    '@lobelia4cosmetics',
+    '@tikvahpharma'
+]
+
+DEFAULT_CONCURRENCY = 3  # Channels scraped at the same time
+INITIAL_FETCH_LIMIT = 200  # Messages fetched for a channel with no high-water mark yet
+DEFAULT_DOWNLOAD_CONCURRENCY = 4  # Photos downloaded at the same time across all channels
+DOWNLOAD_QUEUE_SIZE = 100  # Pending photo downloads before enumeration waits
+MAX_DOWNLOAD_TRIES = 5
+DEFAULT_SEGMENT_FORMAT = "parquet"  # Format of the per-run message segments (see message_segments.py)
+
+
+def state_path(channel_clean, state_dir=STATE_DIR):
+    return os.path.join(state_dir, f'{channel_clean}.json')
+
+
+def load_high_water_mark(channel_clean, raw_dir=RAW_DIR, state_dir=STATE_DIR):
+    """Return the highest message_id already scraped for a channel, or None.
+
+    Reads the channel's state file. Channels scraped before state files
+    existed fall back to one scan of their historical message files.
+    """
+    path = state_path(channel_clean, state_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)['max_message_id']
+        except (json.JSONDecodeError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable state file {path}: {e}")
+
+    max_id = None
+    if os.path.exists(raw_dir):
+        for date_folder in os.listdir(raw_dir):
+            channel_dir = os.path.join(raw_dir, date_folder, channel_clean)
+            try:
+                ids = read_message_ids(channel_dir)
+            except Exception as e:
+                logging.warning(f"Could not read messages in {channel_dir} for {channel_clean}: {e}")
+                continue
+            if ids and (max_id is None or max(ids) > max_id):
+                max_id = max(ids)
+    return max_id
+
+
+def save_high_water_mark(channel_clean, max_message_id, state_dir=STATE_DIR):
+    """Atomically persist the highest scraped message_id for a channel."""
+    os.makedirs(state_dir, exist_ok=True)
+    path = state_path(channel_clean, state_dir)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'max_message_id': max_message_id,
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        }, f)
+    os.replace(tmp_path, path)
+
+
+@backoff.on_exception(backoff.runtime, FloodWaitError, value=lambda e: e.seconds + 1,
+                      max_tries=MAX_DOWNLOAD_TRIES, jitter=None)
+@backoff.on_exception(backoff.expo, (ConnectionError, asyncio.TimeoutError),
+                      max_tries=MAX_DOWNLOAD_TRIES)
+async def download_photo(client, message, image_path):
+    """Download one photo, sleeping out flood waits and backing off on connection errors."""
+    return await client.download_media(message, image_path)
+
+
+class MediaDownloader:
+    """Bounded queue of photo downloads served by a fixed pool of worker tasks.
+
+    Channels enqueue downloads while they keep enumerating messages and get
+    back a future resolving to the saved image path (or None on failure).
+    """
+
+    def __init__(self, client, concurrency=DEFAULT_DOWNLOAD_CONCURRENCY, queue_size=DOWNLOAD_QUEUE_SIZE):
+        self.client = client
+        self.concurrency = concurrency
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = []
+        self.downloaded = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started_at = None
+
+    async def __aenter__(self):
+        self.started_at = time.perf_counter()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.queue.join()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.log_summary()
+
+    async def submit(self, message, image_path, channel_username):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, image_path, channel_username, future))
+        return future
+
+    async def _worker(self):
+        while True:
+            message, image_path, channel_username, future = await self.queue.get()
+            try:
+                with instrumentation.timed("scraper", "image_download"):
+                    await download_photo(self.client, message, image_path)
+                size = os.path.getsize(image_path)
+                self.downloaded += 1
+                self.bytes += size
+                instrumentation.count("scraper", "images_downloaded")
+                instrumentation.add_bytes("scraper", size)
+                logging.info(f"Downloaded image for message {message.id} in channel {channel_username}")
+                future.set_result(image_path)
+            except Exception as img_err:
+                self.failed += 1
+                instrumentation.count("scraper", "image_download_failures")
+                logging.error(f"Failed to download image for message {message.id} in channel {channel_username}: {img_err}")
+                future.set_result(None)
+            finally:
+                self.queue.task_done()
+
+    def log_summary(self):
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        rate = self.bytes / elapsed if elapsed > 0 else 0
+        logging.info(f"Media downloads: {self.downloaded} downloaded, {self.failed} failed, "
+                     f"{self.bytes} bytes in {elapsed:.1f}s ({rate / 1024:.1f} KiB/s)")
+
 
 # Function to scrape data and images
-async def scrape_channel(client, channel_username, scrape_date):
+async def scrape_channel(client, channel_username, scrape_date, raw_dir=RAW_DIR, state_dir=STATE_DIR,
+                         downloader=None, by_post_date=False, segment_format=DEFAULT_SEGMENT_FORMAT):
+    """Fetch messages newer than the channel's high-water mark into a new segment in today's folder.
+
+    With by_post_date, fetch the messages posted on scrape_date (UTC)
+    instead, whatever the high-water mark, so any past day can be
+    (re)scraped into its own folder; messages already stored for that day
+    are skipped.
+
+    Each run writes only its own messages, to its own segment file, so
+    earlier segments are never re-read or rewritten. Photos are handed to
+    `downloader` instead of being awaited inline, so a slow download never
+    stalls enumeration. The segment is written as soon as enumeration ends
+    and replaced once with image_path filled in after the downloads finish;
+    the high-water mark only moves after that second write, and never past
+    a message whose photo failed to download: the next run fetches that
+    message again and retries the photo.
+
+    `client` only needs Telethon's iter_messages/download_media coroutines,
+    so a fake client can be passed in to exercise this without Telegram.
+    """
+    if downloader is None:
+        async with MediaDownloader(client) as downloader:
+            return await scrape_channel(client, channel_username, scrape_date, raw_dir, state_dir, downloader,
+                                        by_post_date, segment_format)
+
     logging.info(f"Starting to retrieve messages from channel: {channel_username}")
     channel_clean = channel_username.lstrip('@')
-    out_dir = os.path.join('data', 'raw', 'telegram_messages', scrape_date, channel_clean)
+    out_dir = os.path.join(raw_dir, scrape_date, channel_clean)
     os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, f'{channel_clean}.json')
+    out_path = segment_path(out_dir, channel_clean, new_run_id(), segment_format)
     image_dir = os.path.join(out_dir, 'images')
     os.makedirs(image_dir, exist_ok=True)
 
-    # Load previously scraped message IDs from all dates for this channel
-    scraped_ids = set()
-    existing_messages = []
-    raw_dir = os.path.join('data', 'raw', 'telegram_messages')
-    if os.path.exists(raw_dir):
-        for date_folder in os.listdir(raw_dir):
-            date_path = os.path.join(raw_dir, date_folder)
-            channel_path = os.path.join(date_path, channel_clean, f'{channel_clean}.json')
-            if os.path.exists(channel_path):
-                try:
-                    with open(channel_path, 'r', encoding='utf-8') as f:
-                        msgs = json.load(f)
-                        scraped_ids.update(msg['message_id'] for msg in msgs)
-                        # If this is today's file, keep the messages for later append
-                        if channel_path == out_path:
-                            existing_messages = msgs
-                except Exception as e:
-                    logging.warning(f"Could not load JSON {channel_path} for {channel_username}: {e}")
-    logging.info(f"Loaded {len(scraped_ids)} total previously scraped messages from all dates for {channel_username}")
+    max_id = load_high_water_mark(channel_clean, raw_dir, state_dir)
+    logging.info(f"High-water mark for {channel_username}: {max_id}")
+
+    # Only the message_id column of the day's earlier segments is read
+    try:
+        known_ids = read_message_ids(out_dir)
+    except Exception as e:
+        logging.warning(f"Could not read existing messages in {out_dir} for {channel_username}: {e}")
+        known_ids = set()
 
     new_messages = []
+    pending_images = []
+    newest_id = None  # Highest id seen, including messages already stored
 
     try:
-        async for message in client.iter_messages(channel_username, limit=200):
-            if message.id in scraped_ids:
-                continue  # Skip already scraped messages
+        # By post date, walk back from the end of the day. With a high-water mark
+        # Telegram returns only newer messages and stops at the boundary;
+        # without one fall back to the most recent batch
+        if by_post_date:
+            day_start = datetime.strptime(scrape_date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            messages = client.iter_messages(channel_username, offset_date=day_start + timedelta(days=1))
+        elif max_id is None:
+            messages = client.iter_messages(channel_username, limit=INITIAL_FETCH_LIMIT)
+        else:
+            messages = client.iter_messages(channel_username, min_id=max_id)
+
+        async for message in messages:
+            # Newest first, so the first message before the day ends the scan
+            if by_post_date and message.date < day_start:
+                break
+            newest_id = message.id if newest_id is None else max(newest_id, message.id)
+            has_photo = message.media and isinstance(message.media, MessageMediaPhoto)
+            image_path = os.path.join(image_dir, f"{message.id}.jpg")
+            # A stored message whose photo never landed is fetched again so the
+            # download is retried; its rewrite in this segment wins over the old one
+            if message.id in known_ids and not (has_photo and not os.path.exists(image_path)):
+                continue
 
             message_data = {
                 'channel': channel_username,
@@ -64,29 +240,39 @@ async def scrape_channel(client, channel_username, scrape_date):
                 'views': message.views
             }
 
-            # Download images if present
-            if message.media and isinstance(message.media, MessageMediaPhoto):
-                image_path = os.path.join(image_dir, f"{message.id}.jpg")
+            # Queue images for download if present
+            if has_photo:
                 if os.path.exists(image_path):
                     message_data['image_path'] = image_path
                     logging.info(f"Image for message {message.id} in channel {channel_username} already exists.")
                 else:
-                    try:
-                        await client.download_media(message, image_path)
-                        message_data['image_path'] = image_path
-                        logging.info(f"Downloaded image for message {message.id} in channel {channel_username}")
-                    except Exception as img_err:
-                        logging.error(f"Failed to download image for message {message.id} in channel {channel_username}: {img_err}")
+                    future = await downloader.submit(message, image_path, channel_username)
+                    pending_images.append((message_data, future))
 
             new_messages.append(message_data)
 
         # Only save if there are new messages
         if new_messages:
-            all_messages = existing_messages + new_messages
-            # Remove duplicates by message_id
-            unique_msgs = {msg['message_id']: msg for msg in all_messages}
-            with open(out_path, 'w', encoding='utf-8') as f:
-                json.dump(list(unique_msgs.values()), f, ensure_ascii=False, indent=2)
+            # Persist right away, then again once pending images have landed
+            write_segment(out_path, new_messages)
+            failed_ids = []
+            if pending_images:
+                for message_data, future in pending_images:
+                    image_path = await future
+                    if image_path:
+                        message_data['image_path'] = image_path
+                    else:
+                        failed_ids.append(message_data['message_id'])
+                write_segment(out_path, new_messages)
+            instrumentation.count("scraper", "messages_fetched", len(new_messages))
+            instrumentation.add_bytes("scraper", os.path.getsize(out_path))
+            # Stop short of the oldest failed photo so the next run fetches it again
+            if failed_ids:
+                newest_id = min(newest_id, min(failed_ids) - 1)
+                logging.warning(f"{len(failed_ids)} photo downloads failed for {channel_username}; "
+                                f"keeping the high-water mark below message {min(failed_ids)}")
+            if max_id is None or newest_id > max_id:
+                save_high_water_mark(channel_clean, newest_id, state_dir)
             logging.info(f"Saved {len(new_messages)} new messages for {channel_username}")
         else:
             logging.info(f"No new messages found for {channel_username}")
@@ -94,22 +280,64 @@ async def scrape_channel(client, channel_username, scrape_date):
     except Exception as e:
         logging.error(f"Error scraping channel {channel_username} on {scrape_date}: {e}")
 
+    return len(new_messages)
+
+
+async def scrape_channels(client, channels, scrape_date, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+    """Scrape several channels concurrently, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
 
-client = TelegramClient('scraping_session', api_id, api_hash)
+    async def bounded(channel):
+        async with semaphore:
+            with instrumentation.timed("scraper", "channel"):
+                return await scrape_channel(client, channel, scrape_date, **kwargs)
 
+    counts = await asyncio.gather(*(bounded(channel) for channel in channels))
+    return dict(zip(channels, counts))
 
-async def main():
+
+async def main(client, concurrency=DEFAULT_CONCURRENCY, download_concurrency=DEFAULT_DOWNLOAD_CONCURRENCY,
+               partition_date=None, segment_format=DEFAULT_SEGMENT_FORMAT):
     await client.start()
-    # List of channels to scrape
-    channels = [
-        '@CheMed123',
-        '@lobelia4cosmetics',
-        '@tikvahpharma'
-    ]
-    scrape_date = datetime.now().strftime('%Y-%m-%d')
-    for channel in channels:
-        await scrape_channel(client, channel, scrape_date)
+    if partition_date is None:
+        scrape_date, by_post_date = datetime.now().strftime('%Y-%m-%d'), False
+    else:
+        scrape_date, by_post_date = partition_date, True
+    async with MediaDownloader(client, download_concurrency) as downloader:
+        counts = await scrape_channels(client, CHANNELS, scrape_date, concurrency, downloader=downloader,
+                                       by_post_date=by_post_date, segment_format=segment_format)
+    logging.info(f"Scrape finished: {counts}")
+    return counts
 
-if __name__ == "__main__":
+
+def scrape_partition(partition_date, concurrency=DEFAULT_CONCURRENCY,
+                     download_concurrency=DEFAULT_DOWNLOAD_CONCURRENCY, segment_format=DEFAULT_SEGMENT_FORMAT):
+    """Scrape the messages posted on partition_date (YYYY-MM-DD) into that day's folder.
+
+    Returns the number of new messages per channel.
+    """
+    client = TelegramClient('scraping_session', api_id, api_hash)
     with client:
-        client.loop.run_until_complete(main())
\ No newline at end of file
+        return client.loop.run_until_complete(main(client, concurrency, download_concurrency, partition_date,
+                                                   segment_format))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape Telegram channels into data/raw/telegram_messages")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="Channels scraped at the same time")
+    parser.add_argument('--download-concurrency', type=int, default=DEFAULT_DOWNLOAD_CONCURRENCY,
+                        help="Photos downloaded at the same time across all channels")
+    parser.add_argument('--date', default=None,
+                        help="Scrape the messages posted on this day (YYYY-MM-DD) instead of everything new")
+    parser.add_argument('--segment-format', choices=SEGMENT_FORMATS, default=DEFAULT_SEGMENT_FORMAT,
+                        help="File format of the message segment each run writes")
+    args = parser.parse_args()
+
+    if args.date:
+        scrape_partition(args.date, args.concurrency, args.download_concurrency, args.segment_format)
+    else:
+        client = TelegramClient('scraping_session', api_id, api_hash)
+        with client:
+            client.loop.run_until_complete(main(client, args.concurrency, args.download_concurrency,
+                                                segment_format=args.segment_format))
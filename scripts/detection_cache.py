@@ -0,0 +1,87 @@
+import json
+import sqlite3
+import xxhash
+from pathlib import Path
+
+# === Paths ===
+CACHE_PATH = Path("data/raw/detected_images/detection_cache.sqlite")
+
+
+def fingerprint_models(weight_paths, *settings):
+    """Hash model weight files plus any result-affecting settings into one key.
+
+    Retraining or swapping a model changes the fingerprint, so entries
+    computed with the old weights are never returned.
+    """
+    digest = xxhash.xxh64()
+    for weight_path in weight_paths:
+        weight_path = Path(weight_path)
+        if weight_path.exists():
+            with open(weight_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        else:
+            digest.update(str(weight_path).encode('utf-8'))
+    for setting in settings:
+        digest.update(repr(setting).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def hash_image_bytes(data):
+    return xxhash.xxh64(data).hexdigest()
+
+
+class DetectionCache:
+    """Persistent map of (image content hash, model fingerprint) -> detected boxes.
+
+    Backed by SQLite in WAL mode so several shard processes can share it.
+    Use one instance per thread.
+    """
+
+    def __init__(self, model_fingerprint, path=CACHE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_fingerprint = model_fingerprint
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(str(path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS detection_cache (
+                image_hash TEXT NOT NULL,
+                model_fingerprint TEXT NOT NULL,
+                boxes TEXT NOT NULL,
+                PRIMARY KEY (image_hash, model_fingerprint)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, image_hash):
+        """Return the cached boxes dict for an image, or None on a miss."""
+        row = self._conn.execute(
+            "SELECT boxes FROM detection_cache WHERE image_hash = ? AND model_fingerprint = ?",
+            (image_hash, self.model_fingerprint)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, image_hash, boxes):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO detection_cache (image_hash, model_fingerprint, boxes) VALUES (?, ?, ?)",
+            (image_hash, self.model_fingerprint, json.dumps(boxes))
+        )
+        self._conn.commit()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        print(f"Detection cache: {self.hits} hits, {self.misses} misses "
+              f"({self.hit_rate():.1%} hit rate)")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,113 @@
+import os
+import json
+from pathlib import Path
+
+# === Paths ===
+DETECTIONS_JSONL = Path("data/raw/detected_images/image_detections.jsonl")
+LEGACY_DETECTIONS_JSON = Path("data/raw/detected_images/image_detections.json")
+
+
+def detection_channel(relative_path):
+    """Channel folder of a detection's <scrape_date>/<channel>/images/<message_id>.jpg path.
+
+    Message ids are only unique within a channel, so the channel is part of
+    a detection's key. Paths recorded on Windows use backslashes.
+    """
+    parts = str(relative_path).replace('\\', '/').split('/')
+    return parts[1] if len(parts) > 1 else ''
+
+
+def migrate_legacy_json(store_path=DETECTIONS_JSONL, legacy_path=LEGACY_DETECTIONS_JSON):
+    """Convert the old single-array image_detections.json into the JSON Lines store once."""
+    store_path = Path(store_path)
+    legacy_path = Path(legacy_path)
+    if store_path.exists() or not legacy_path.exists():
+        return
+
+    try:
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            detections = json.load(f)
+    except json.JSONDecodeError:
+        print(f"Warning: Failed to parse legacy detection file {legacy_path}")
+        return
+
+    append_detections(detections, store_path)
+    print(f"Migrated {len(detections)} detections from {legacy_path} to {store_path}")
+
+
+def append_detections(detections, store_path=DETECTIONS_JSONL):
+    """Append detection records to the store, one JSON object per line."""
+    if not detections:
+        return
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(store_path, 'a', encoding='utf-8') as f:
+        for det in detections:
+            f.write(json.dumps(det) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def iter_detections_from(offset=0, store_path=DETECTIONS_JSONL):
+    """Stream (next_offset, record) pairs starting at a byte offset.
+
+    A trailing line without a newline is treated as an in-progress write and
+    not returned, so next_offset is always safe to resume from. Lines that
+    are not valid JSON are skipped with a warning.
+    """
+    store_path = Path(store_path)
+    if not store_path.exists():
+        return
+
+    with open(store_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                print(f"Warning: Skipping malformed detection line ending at byte {offset} of {store_path}")
+                continue
+            yield offset, record
+
+
+def iter_detections(store_path=DETECTIONS_JSONL):
+    """Stream every detection record in the store."""
+    for _, record in iter_detections_from(0, store_path):
+        yield record
+
+
+def merge_detection_files(sources, store_path=DETECTIONS_JSONL):
+    """Fold side stores (e.g. per-shard files) into the main store and delete them.
+
+    Records for an image whose relative_path is already in the main store are
+    dropped, so merging the same shard output twice never duplicates rows.
+    Returns the number of records appended.
+    """
+    sources = [Path(source) for source in sources if Path(source).exists()]
+    if not sources:
+        return 0
+
+    known_paths = {d['relative_path'] for d in iter_detections(store_path)}
+    merged = 0
+    for source in sources:
+        new_paths = set()
+        batch = []
+        for det in iter_detections(source):
+            if det['relative_path'] in known_paths:
+                continue
+            new_paths.add(det['relative_path'])
+            batch.append(det)
+            if len(batch) >= 1000:
+                append_detections(batch, store_path)
+                merged += len(batch)
+                batch = []
+        append_detections(batch, store_path)
+        merged += len(batch)
+        known_paths |= new_paths
+        source.unlink()
+    return merged
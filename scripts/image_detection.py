@@ -1,21 +1,96 @@
-import json
+import os
+import time
+import zlib
+import queue
+import argparse
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import cv2
+import numpy as np
 from ultralytics import YOLO
 from pathlib import Path
 from datetime import datetime, timezone
+from detection_store import (
+    DETECTIONS_JSONL, append_detections, detection_channel, iter_detections, merge_detection_files,
+    migrate_legacy_json
+)
+from detection_cache import DetectionCache, fingerprint_models, hash_image_bytes
+import instrumentation
 
 # === Paths ===
 BASE_IMAGE_DIR = Path("data/raw/telegram_messages")
-OUTPUT_JSON = Path("data/raw/detected_images/image_detections.json")
+OUTPUT_JSON = DETECTIONS_JSONL
 OUTPUT_IMG_DIR = Path("data/raw/detected_images")
 
-# === Load Models ===
-general_model = YOLO("yolov8n.pt")  # General object detection (COCO)
+# === Inference Settings ===
+DEFAULT_BATCH_SIZE = 8  # Images decoded and fed to each model per forward pass
+DEFAULT_READERS = 4  # Threads decoding JPEGs ahead of inference
+DEFAULT_WRITERS = 2  # Threads drawing and saving annotated images
+DEFAULT_QUEUE_SIZE = 64  # Max images buffered between stages
+PILL_CONFIDENCE_THRESHOLD = 0.7
+GENERAL_COLOR = (0, 255, 0)
+PILL_COLOR = (0, 0, 255)
+
+# === Models ===
+GENERAL_WEIGHTS = "yolov8n.pt"  # General object detection (COCO)
+PILL_WEIGHTS = "runs/detect/train7/weights/best.pt"  # Trained pill detector
 
 # To train the model with pill dataset
-# general_model.train(data='medical-pills.yaml', epochs=50, imgsz=640)
+# YOLO(GENERAL_WEIGHTS).train(data='medical-pills.yaml', epochs=50, imgsz=640)
+
+# === Inference Backends ===
+# "torch" runs the .pt checkpoints eagerly; "onnx" runs a one-off ONNX export
+# of them through onnxruntime on CPU (requires the onnx and onnxruntime packages).
+BACKENDS = ("torch", "onnx")
+
+_models = {}
+
+def export_onnx(weights, int8=False):
+    """Export a .pt checkpoint to ONNX once, re-exporting only if the weights changed.
+
+    With int8=True the export is additionally dynamically quantized to INT8
+    weights. Returns the path of the ONNX file to load.
+    """
+    weights = Path(weights)
+    onnx_path = weights.with_suffix(".onnx")
+    if not onnx_path.exists() or (weights.exists() and weights.stat().st_mtime > onnx_path.stat().st_mtime):
+        print(f"Exporting {weights} to ONNX")
+        onnx_path = Path(YOLO(str(weights)).export(format="onnx", dynamic=True, imgsz=640))
+
+    if not int8:
+        return onnx_path
+
+    int8_path = onnx_path.with_name(f"{onnx_path.stem}.int8.onnx")
+    if not int8_path.exists() or onnx_path.stat().st_mtime > int8_path.stat().st_mtime:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print(f"Quantizing {onnx_path} to INT8")
+        quantize_dynamic(str(onnx_path), str(int8_path), weight_type=QuantType.QUInt8)
+    return int8_path
+
+def model_weight_paths(backend="torch", int8=False):
+    """Return the (general, pill) weight files used by a backend, exporting them if needed."""
+    if backend == "torch":
+        if int8:
+            raise ValueError("INT8 weights are only available with the onnx backend")
+        return [GENERAL_WEIGHTS, PILL_WEIGHTS]
+    if backend == "onnx":
+        return [str(export_onnx(weights, int8)) for weights in (GENERAL_WEIGHTS, PILL_WEIGHTS)]
+    raise ValueError(f"Unknown inference backend: {backend}")
 
-pill_model = YOLO("runs/detect/train7/weights/best.pt")  # Trained pill detector
+def load_models(backend="torch", int8=False):
+    """Load (general_model, pill_model) for a backend once per process.
+
+    Loading lazily keeps importing this module cheap and lets every shard
+    process build its own model instances.
+    """
+    key = (backend, int8)
+    if key not in _models:
+        general_weights, pill_weights = model_weight_paths(backend, int8)
+        _models[key] = (YOLO(general_weights, task="detect"), YOLO(pill_weights, task="detect"))
+    return _models[key]
 
 def extract_message_id(filename):
     try:
@@ -23,101 +98,394 @@ def extract_message_id(filename):
     except ValueError:
         return None
 
-def load_existing_detections():
-    if OUTPUT_JSON.exists():
-        with open(OUTPUT_JSON, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: Failed to parse existing detection file {OUTPUT_JSON}")
-                return []
-    return []
-
-def detect_objects():
-    detections = []
-    existing_detections = load_existing_detections()
-
-    # Build a set of detected message_ids or relative paths to skip
-    detected_message_ids = set(d['message_id'] for d in existing_detections)
-    # Or, to be more strict, use relative paths:
-    detected_relative_paths = set(d['relative_path'] for d in existing_detections)
-
-    for image_path in BASE_IMAGE_DIR.rglob("*.jpg"):
+def shard_of(relative_path, shard_count):
+    """Deterministically assign an image to one of shard_count partitions."""
+    return zlib.crc32(Path(relative_path).as_posix().encode('utf-8')) % shard_count
+
+def shard_store_path(index, count):
+    return OUTPUT_JSON.with_name(f"{OUTPUT_JSON.stem}.shard-{index}-of-{count}{OUTPUT_JSON.suffix}")
+
+def leftover_shard_stores():
+    return sorted(OUTPUT_JSON.parent.glob(f"{OUTPUT_JSON.stem}.shard-*{OUTPUT_JSON.suffix}"))
+
+def load_detected_keys(store_paths=(OUTPUT_JSON,)):
+    """Stream the detection stores and return the (channel, message_id) keys and paths already processed.
+
+    Message ids repeat across channels, so an id is only skipped within its own channel.
+    """
+    migrate_legacy_json()
+    detected_message_keys = set()
+    detected_relative_paths = set()
+    for store_path in store_paths:
+        for d in iter_detections(store_path):
+            detected_message_keys.add((detection_channel(d['relative_path']), d['message_id']))
+            detected_relative_paths.add(d['relative_path'])
+    return detected_message_keys, detected_relative_paths
+
+def iter_pending_images(detected_message_keys, detected_relative_paths, shard=None, scrape_date=None):
+    """Yield (image_path, message_id, relative_path) for images not yet in the detection store.
+
+    shard=(index, count) restricts the listing to that shard's partition,
+    scrape_date (YYYY-MM-DD) to the images scraped into that day's folder.
+    """
+    search_root = BASE_IMAGE_DIR if scrape_date is None else BASE_IMAGE_DIR / scrape_date
+    for image_path in search_root.rglob("*.jpg"):
         message_id = extract_message_id(image_path)
         if message_id is None:
             continue
 
         relative_path = str(image_path.relative_to(BASE_IMAGE_DIR))
+        if shard is not None and shard_of(relative_path, shard[1]) != shard[0]:
+            continue
 
-        # Skip if already detected (by message_id or by path)
-        if message_id in detected_message_ids or relative_path in detected_relative_paths:
+        # Skip if already detected (by channel and message_id, or by path)
+        if ((detection_channel(relative_path), message_id) in detected_message_keys
+                or relative_path in detected_relative_paths):
             print(f"Skipping already detected image: {relative_path}")
             continue
 
-        # === Run Both Models ===
-        results_general = general_model(image_path)[0]
-        results_pill = pill_model(image_path)[0]
-
-        # === Read Original Image for Annotation ===
-        image = cv2.imread(str(image_path))
-
-        # === Collect and Draw General Detections ===
-        for box in results_general.boxes:
-            cls = int(box.cls[0])
-            conf = float(box.conf[0])
-            label = general_model.names[cls]
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-
-            detections.append({
-                "message_id": message_id,
-                "detected_object_class": label,
-                "confidence_score": conf,
-                "image_filename": image_path.name,
-                "relative_path": relative_path,
-                "processed_at": datetime.now(timezone.utc).isoformat()
-            })
-
-            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(image, f"{label} {conf:.2f}", (x1, y1 - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        # === Collect and Draw Pill Detections ===
-        for box in results_pill.boxes:
-            cls = int(box.cls[0])
-            conf = float(box.conf[0])
-            if conf < 0.7:
-                continue
-            label = pill_model.names[cls]
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-
-            detections.append({
-                "message_id": message_id,
-                "detected_object_class": label,
-                "confidence_score": conf,
-                "image_filename": image_path.name,
-                "relative_path": relative_path,
-                "processed_at": datetime.now(timezone.utc).isoformat()
-            })
-
-            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(image, f"{label} {conf:.2f}", (x1, y1 - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-        # === Save Annotated Image ===
-        save_path = OUTPUT_IMG_DIR / relative_path
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        cv2.imwrite(str(save_path), image)
-
-    # === Append new detections to existing and save ===
-    all_detections = existing_detections + detections
-
-    if all_detections:
-        OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-        with open(OUTPUT_JSON, "w") as f:
-            json.dump(all_detections, f, indent=2)
-        print(f"[✔] Detection results saved to {OUTPUT_JSON}")
+        yield image_path, message_id, relative_path
+
+class StageTimer:
+    """Thread-safe wall-clock and item counters per pipeline stage.
+
+    Every timing is also recorded as a "detection" step in instrumentation.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.seconds[stage] += elapsed
+                self.counts[stage] += items
+            instrumentation.observe("detection", stage, elapsed)
+
+    def report(self):
+        print("Stage timings:")
+        for stage in self.seconds:
+            seconds = self.seconds[stage]
+            count = self.counts[stage]
+            per_item = seconds / count * 1000 if count else 0
+            print(f"  {stage:<14} {seconds:8.2f}s  {count:6d} items  {per_item:8.1f} ms/item")
+
+def decode_image(image_path, timer):
+    """Read an image once, returning (content hash, decoded BGR array or None)."""
+    with timer.time("decode"):
+        data = Path(image_path).read_bytes()
+        instrumentation.add_bytes("detection", len(data))
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return hash_image_bytes(data), image
+
+def start_reader(pending, read_queue, readers, timer):
+    """Decode pending images on a thread pool, queueing (item, future) in listing order.
+
+    The bounded queue caps how far decoding runs ahead of inference. A None
+    sentinel marks the end of the listing.
+    """
+    def produce():
+        try:
+            with ThreadPoolExecutor(max_workers=readers) as pool:
+                for item in pending:
+                    read_queue.put((item, pool.submit(decode_image, item[0], timer)))
+        finally:
+            read_queue.put(None)
+
+    thread = threading.Thread(target=produce, name="image-reader", daemon=True)
+    thread.start()
+    return thread
+
+def iter_decoded_images(read_queue, timer):
+    """Yield (item, image_hash, image) from the reader queue until its sentinel."""
+    while True:
+        with timer.time("wait_decode"):
+            entry = read_queue.get()
+            if entry is not None:
+                item, future = entry
+                image_hash, image = future.result()
+        if entry is None:
+            break
+        if image is None:
+            print(f"Warning: Could not decode image {item[2]}")
+            continue
+        yield item, image_hash, image
+
+def run_models(models, images):
+    """Run both models over a batch of decoded images, returning (general, pill) results per image."""
+    general_model, pill_model = models
+    with instrumentation.timed("detection", "inference_general"):
+        results_general = general_model(images, verbose=False)
+    with instrumentation.timed("detection", "inference_pill"):
+        results_pill = pill_model(images, verbose=False)
+    return list(zip(results_general, results_pill))
+
+def infer_batch(models, batch, timer, cache):
+    """Infer one batch of (item, image_hash, image), caching and yielding boxes per image."""
+    general_model, pill_model = models
+    with timer.time("inference", items=len(batch)):
+        results = run_models(models, [image for _, _, image in batch])
+    for (item, image_hash, image), (results_general, results_pill) in zip(batch, results):
+        general_boxes = extract_boxes(results_general, general_model.names)
+        pill_boxes = extract_boxes(results_pill, pill_model.names, PILL_CONFIDENCE_THRESHOLD)
+        if cache is not None:
+            cache.put(image_hash, {"general": general_boxes, "pill": pill_boxes})
+        yield item, image, general_boxes, pill_boxes
+
+def iter_batched_results(models, read_queue, batch_size, timer, cache=None):
+    """Yield (item, image, general_boxes, pill_boxes) per image, inferring in batches.
+
+    Images whose content hash is already in the cache (reposted photos) are
+    yielded straight away without touching either model.
+    """
+    batch = []
+    for item, image_hash, image in iter_decoded_images(read_queue, timer):
+        cached = cache.get(image_hash) if cache is not None else None
+        if cached is not None:
+            instrumentation.count("detection", "cache_hits")
+            yield item, image, boxes_from_json(cached["general"]), boxes_from_json(cached["pill"])
+            continue
+        batch.append((item, image_hash, image))
+        if len(batch) >= batch_size:
+            yield from infer_batch(models, batch, timer, cache)
+            batch = []
+    if batch:
+        yield from infer_batch(models, batch, timer, cache)
+
+def start_writers(write_queue, writers, timer):
+    """Start threads that draw boxes on and save annotated images from the write queue."""
+    def consume():
+        while True:
+            entry = write_queue.get()
+            if entry is None:
+                break
+            relative_path, image, general_boxes, pill_boxes = entry
+            try:
+                with timer.time("annotate"):
+                    draw_boxes(image, general_boxes, GENERAL_COLOR)
+                    draw_boxes(image, pill_boxes, PILL_COLOR)
+                with timer.time("write"):
+                    save_path = OUTPUT_IMG_DIR / relative_path
+                    save_path.parent.mkdir(parents=True, exist_ok=True)
+                    cv2.imwrite(str(save_path), image)
+            except Exception as e:
+                print(f"Failed to save annotated image {relative_path}: {e}")
+
+    threads = [threading.Thread(target=consume, name=f"image-writer-{i}", daemon=True)
+               for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def extract_boxes(results, names, min_confidence=0.0):
+    """Convert a YOLO result into a list of (label, confidence, (x1, y1, x2, y2)) tuples."""
+    boxes = results.boxes
+    coords = boxes.xyxy.cpu().numpy().astype(int).tolist()
+    confidences = boxes.conf.cpu().tolist()
+    classes = boxes.cls.cpu().tolist()
+    return [
+        (names[int(cls)], float(conf), tuple(xyxy))
+        for cls, conf, xyxy in zip(classes, confidences, coords)
+        if conf >= min_confidence
+    ]
+
+def boxes_from_json(boxes):
+    return [(label, conf, tuple(xyxy)) for label, conf, xyxy in boxes]
+
+def draw_boxes(image, boxes, color):
+    for label, conf, (x1, y1, x2, y2) in boxes:
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(image, f"{label} {conf:.2f}", (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+def build_detection_records(boxes, message_id, image_filename, relative_path):
+    processed_at = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            "message_id": message_id,
+            "detected_object_class": label,
+            "confidence_score": conf,
+            "image_filename": image_filename,
+            "relative_path": relative_path,
+            "processed_at": processed_at
+        }
+        for label, conf, _ in boxes
+    ]
+
+def detect_objects(batch_size=DEFAULT_BATCH_SIZE, readers=DEFAULT_READERS, writers=DEFAULT_WRITERS,
+                   annotate=True, queue_size=DEFAULT_QUEUE_SIZE, shard=None, store_path=OUTPUT_JSON,
+                   use_cache=True, backend="torch", int8=False, scrape_date=None):
+    """Detect objects in new images using a decode -> infer -> annotate/write pipeline.
+
+    Decoding and annotated-image writes run on their own thread pools, joined
+    to the inference loop by bounded queues, so disk I/O overlaps with model
+    time. With annotate=False no annotated images are drawn or written.
+    shard=(index, count) processes only that partition of the images and
+    appends to store_path instead of the main store. With use_cache, boxes
+    are looked up by image content hash and model fingerprint first.
+    backend selects PyTorch or ONNX Runtime inference (see BACKENDS).
+    scrape_date limits the run to one day's images. Returns the number of
+    detections appended.
+    """
+    new_detection_count = 0
+    timer = StageTimer()
+    start = time.perf_counter()
+    models = load_models(backend, int8)
+    cache = None
+    if use_cache:
+        cache = DetectionCache(fingerprint_models(model_weight_paths(backend, int8), PILL_CONFIDENCE_THRESHOLD))
+
+    # Build a set of detected (channel, message_id) keys or relative paths to skip
+    store_paths = [OUTPUT_JSON] if store_path == OUTPUT_JSON else [OUTPUT_JSON, store_path]
+    detected_message_keys, detected_relative_paths = load_detected_keys(store_paths)
+    pending = iter_pending_images(detected_message_keys, detected_relative_paths, shard, scrape_date)
+
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    start_reader(pending, read_queue, readers, timer)
+    writer_threads = start_writers(write_queue, writers, timer) if annotate else []
+
+    images = 0
+    try:
+        for (image_path, message_id, relative_path), image, general_boxes, pill_boxes in \
+                iter_batched_results(models, read_queue, batch_size, timer, cache):
+            images += 1
+            instrumentation.count("detection", "images")
+
+            # === Hand the image to the writer pool for annotation ===
+            if annotate:
+                with timer.time("wait_write"):
+                    write_queue.put((relative_path, image, general_boxes, pill_boxes))
+
+            # === Append this image's detections to the store ===
+            with timer.time("store"):
+                detections = build_detection_records(general_boxes + pill_boxes, message_id,
+                                                      image_path.name, relative_path)
+                append_detections(detections, store_path)
+            new_detection_count += len(detections)
+            instrumentation.count("detection", "detections", len(detections))
+    finally:
+        for _ in writer_threads:
+            write_queue.put(None)
+        for thread in writer_threads:
+            thread.join()
+        if cache is not None:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    rate = images / elapsed if elapsed > 0 else 0
+    print(f"Processed {images} images in {elapsed:.2f}s ({rate:.2f} images/sec)")
+    timer.report()
+    if cache is not None:
+        cache.report()
+
+    if new_detection_count:
+        print(f"[✔] {new_detection_count} detection results appended to {store_path}")
     else:
         print("No new detections found.")
+    return new_detection_count
+
+def limit_onnx_threads(threads):
+    """Make onnxruntime sessions created in this process use `threads` threads.
+
+    Ultralytics builds its InferenceSession without SessionOptions, so it
+    would size its thread pool to every core; sessions created without
+    options get ones capped to this process's budget instead.
+    """
+    import onnxruntime
+    session_class = onnxruntime.InferenceSession
+
+    def limited_session(path_or_bytes, sess_options=None, *args, **kwargs):
+        if sess_options is None:
+            sess_options = onnxruntime.SessionOptions()
+            sess_options.intra_op_num_threads = threads
+            sess_options.inter_op_num_threads = threads
+        return session_class(path_or_bytes, sess_options, *args, **kwargs)
+
+    onnxruntime.InferenceSession = limited_session
+
+def run_shard(index, count, threads, options):
+    """Process entry point for one shard: pin thread counts, then detect its partition."""
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    if options.get("backend") == "onnx":
+        limit_onnx_threads(threads)
+    print(f"[shard {index}/{count}] starting with {threads} threads")
+    detect_objects(shard=(index, count), store_path=shard_store_path(index, count), **options)
+
+def detect_objects_sharded(shards, threads_per_shard=None, **options):
+    """Run detect_objects across `shards` worker processes and merge their outputs.
+
+    Each shard owns a crc32(relative_path) partition and appends to its own
+    shard store. Shard stores are merged into the main store (skipping images
+    it already has) at the end of the run and again at the start of the next
+    one, so a killed shard resumes from what it had already written.
+    """
+    migrate_legacy_json()
+    # Export once up front so shards don't race to write the same ONNX files
+    model_weight_paths(options.get("backend", "torch"), options.get("int8", False))
+    recovered = merge_detection_files(leftover_shard_stores(), OUTPUT_JSON)
+    if recovered:
+        print(f"Recovered {recovered} detections from interrupted shards")
+
+    threads = threads_per_shard or max(1, (os.cpu_count() or 1) // shards)
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=run_shard, args=(index, shards, threads, options), name=f"detect-shard-{index}")
+        for index in range(shards)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    failed = [process.name for process in processes if process.exitcode != 0]
+    merged = merge_detection_files(leftover_shard_stores(), OUTPUT_JSON)
+    print(f"[✔] Merged {merged} shard detections into {OUTPUT_JSON}")
+    if failed:
+        print(f"Shards failed: {', '.join(failed)}; rerun to resume them")
+    return merged
 
 if __name__ == "__main__":
-    detect_objects()
+    parser = argparse.ArgumentParser(description="Run YOLO object detection over scraped Telegram images")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Images per inference batch for each model")
+    parser.add_argument('--readers', type=int, default=DEFAULT_READERS,
+                        help="Threads decoding images ahead of inference")
+    parser.add_argument('--writers', type=int, default=DEFAULT_WRITERS,
+                        help="Threads drawing and saving annotated images")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Max images buffered between pipeline stages")
+    parser.add_argument('--no-annotate', dest='annotate', action='store_false',
+                        help="Only record detections, skip drawing and saving annotated images")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Worker processes, each detecting a hash partition of the images")
+    parser.add_argument('--threads-per-shard', type=int, default=None,
+                        help="Torch/OpenCV/ONNX Runtime threads per shard (default: CPU count / shards)")
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="Always run inference instead of reusing boxes for identical images")
+    parser.add_argument('--backend', choices=BACKENDS, default="torch",
+                        help="Inference runtime: eager PyTorch or an ONNX export run by onnxruntime")
+    parser.add_argument('--int8', action='store_true',
+                        help="Use INT8-quantized exports (requires --backend onnx)")
+    parser.add_argument('--date', default=None,
+                        help="Only detect images scraped into this day's folder (YYYY-MM-DD)")
+    args = parser.parse_args()
+    if args.int8 and args.backend != "onnx":
+        parser.error("--int8 requires --backend onnx")
+
+    options = dict(batch_size=args.batch_size, readers=args.readers, writers=args.writers,
+                   annotate=args.annotate, queue_size=args.queue_size, use_cache=args.use_cache,
+                   backend=args.backend, int8=args.int8, scrape_date=args.date)
+    if args.shards > 1:
+        detect_objects_sharded(args.shards, args.threads_per_shard, **options)
+    else:
+        detect_objects(**options)
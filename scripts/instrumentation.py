@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from prometheus_client import REGISTRY, Counter, Histogram, push_to_gateway
+
+# Every stage (scraper, detection, message_loader, detection_loader, api_query,
+# api_request) records into the same three metric families, so one dashboard
+# compares them all. The API serves them at /metrics; pipeline processes can
+# push theirs to a Pushgateway (see push_metrics).
+STAGE_ITEMS = Counter("telegram_stage_items", "Items processed per pipeline stage", ["stage", "item"])
+STAGE_BYTES = Counter("telegram_stage_bytes", "Bytes read or written per pipeline stage", ["stage"])
+STAGE_SECONDS = Histogram("telegram_stage_seconds", "Time spent in each step of a pipeline stage",
+                          ["stage", "step"])
+
+PUSHGATEWAY_URL = os.getenv("PROMETHEUS_PUSHGATEWAY")
+
+_lock = threading.Lock()
+_collectors = []
+
+
+class Collector:
+    """Totals recorded while it is active, for one run's summary (e.g. Dagster metadata)."""
+
+    def __init__(self):
+        self.items = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def metadata(self):
+        """Flat {"<stage>.<name>": value} dict; timings are total milliseconds."""
+        values = {}
+        for (stage, item), count in self.items.items():
+            values[f"{stage}.{item}"] = count
+        for stage, count in self.bytes.items():
+            values[f"{stage}.bytes"] = count
+        for (stage, step), seconds in self.seconds.items():
+            values[f"{stage}.{step}_ms"] = round(seconds * 1000, 1)
+            values[f"{stage}.{step}_calls"] = self.calls[(stage, step)]
+        return dict(sorted(values.items()))
+
+
+@contextmanager
+def collect():
+    """Yield a Collector receiving everything recorded, from any thread, until the block exits."""
+    collector = Collector()
+    with _lock:
+        _collectors.append(collector)
+    try:
+        yield collector
+    finally:
+        with _lock:
+            _collectors.remove(collector)
+
+
+def count(stage, item, value=1):
+    STAGE_ITEMS.labels(stage, item).inc(value)
+    with _lock:
+        for collector in _collectors:
+            collector.items[(stage, item)] += value
+
+
+def add_bytes(stage, value):
+    STAGE_BYTES.labels(stage).inc(value)
+    with _lock:
+        for collector in _collectors:
+            collector.bytes[stage] += value
+
+
+def observe(stage, step, seconds):
+    STAGE_SECONDS.labels(stage, step).observe(seconds)
+    with _lock:
+        for collector in _collectors:
+            collector.seconds[(stage, step)] += seconds
+            collector.calls[(stage, step)] += 1
+
+
+@contextmanager
+def timed(stage, step):
+    """Record the block's wall-clock time as one observation of stage/step."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, step, time.perf_counter() - start)
+
+
+def push_metrics(job, **grouping_key):
+    """Push this process's metrics to PROMETHEUS_PUSHGATEWAY, if configured.
+
+    Pipeline steps are short-lived processes that Prometheus can't scrape;
+    a failed push is reported but never fails the step.
+    """
+    if not PUSHGATEWAY_URL:
+        return
+    try:
+        push_to_gateway(PUSHGATEWAY_URL, job=job, registry=REGISTRY, grouping_key=grouping_key)
+    except OSError as e:
+        print(f"Could not push metrics to {PUSHGATEWAY_URL}: {e}")
@@ -1,12 +1,25 @@
 import os
+import io
+import csv
 import json
 import psycopg2
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 from datetime import datetime
+from detection_store import DETECTIONS_JSONL, detection_channel, iter_detections_from, migrate_legacy_json
+import instrumentation
+from raw_load_lock import lock_for_load
+from raw_partitions import convert_to_partitioned, ensure_monthly_partitions, is_unpartitioned
 
 # Load environment variables from .env file
 load_dotenv('.env')
 
+# Number of detection records merged per COPY round trip
+DEFAULT_BATCH_SIZE = 5000
+
+# Advisory lock serializing detection merges across loader processes
+DETECTION_MERGE_LOCK = "raw.image_detections merge"
+
 def get_db_connection():
     """Establish database connection using environment variables."""
     return psycopg2.connect(
@@ -17,83 +30,320 @@ def get_db_connection():
         port=os.getenv('DB_PORT', '5432')
     )
 
+DETECTIONS_TABLE_COLUMNS = (
+    "id", "message_id", "detected_object_class", "confidence_score",
+    "image_filename", "relative_path", "processed_at", "loaded_at"
+)
+
+# Range-partitioned by month of processed_at (see raw_partitions.py); the
+# unique key must include it, so cross-partition duplicates are filtered on merge
+DETECTIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS raw.image_detections (
+    id SERIAL,
+    message_id INTEGER,
+    channel_name TEXT,
+    detected_object_class VARCHAR(255),
+    confidence_score REAL,
+    image_filename VARCHAR(255),
+    relative_path TEXT,
+    processed_at TIMESTAMP NOT NULL,
+    loaded_at TIMESTAMP DEFAULT clock_timestamp(),
+    PRIMARY KEY (id, processed_at)
+) PARTITION BY RANGE (processed_at)
+"""
+
 def create_detections_table(conn):
-    """Create the raw.image_detections table with necessary constraints and indexes."""
+    """Create the partitioned raw.image_detections table with necessary constraints and indexes."""
     with conn.cursor() as cursor:
-        cursor.execute("""
-            CREATE SCHEMA IF NOT EXISTS raw;
-
-            CREATE TABLE IF NOT EXISTS raw.image_detections (
-                id SERIAL PRIMARY KEY,
-                message_id INTEGER,
-                detected_object_class VARCHAR(255),
-                confidence_score REAL,
-                image_filename VARCHAR(255),
-                relative_path TEXT,
-                processed_at TIMESTAMP,
-                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS raw")
+        converted = is_unpartitioned(cursor, 'image_detections')
+        if converted:
+            convert_to_partitioned(cursor, 'image_detections', DETECTIONS_TABLE_SQL,
+                                   'processed_at', DETECTIONS_TABLE_COLUMNS)
 
+        cursor.execute(DETECTIONS_TABLE_SQL)
+        # Rows loaded before channel_name existed get it from their relative_path
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'raw' AND table_name = 'image_detections' AND column_name = 'channel_name'
+        """)
+        if converted or cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE raw.image_detections ADD COLUMN IF NOT EXISTS channel_name TEXT")
+            cursor.execute("""
+                UPDATE raw.image_detections
+                SET channel_name = split_part(replace(relative_path, '\\', '/'), '/', 2)
+                WHERE channel_name IS NULL
+            """)
+            cursor.execute("""
+                DROP INDEX IF EXISTS raw.idx_detection_key;
+                DROP INDEX IF EXISTS raw.uniq_detection;
+            """)
+        cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_message_id 
                 ON raw.image_detections(message_id);
 
             CREATE INDEX IF NOT EXISTS idx_detected_object_class 
                 ON raw.image_detections(detected_object_class);
 
-            -- ✅ This line adds the missing unique constraint
-            CREATE UNIQUE INDEX IF NOT EXISTS uniq_detection 
-                ON raw.image_detections(message_id, image_filename, detected_object_class);
+            -- Incremental dbt runs select rows loaded since their last run
+            CREATE INDEX IF NOT EXISTS idx_detections_loaded_at
+                ON raw.image_detections(loaded_at);
+
+            -- Detection key lookup across partitions, plus the per-partition unique constraint.
+            -- Message ids repeat across channels, so the channel is part of the key
+            CREATE INDEX IF NOT EXISTS idx_channel_detection_key
+                ON raw.image_detections(channel_name, message_id, image_filename, detected_object_class);
+            CREATE UNIQUE INDEX IF NOT EXISTS uniq_channel_detection
+                ON raw.image_detections(channel_name, message_id, image_filename, detected_object_class,
+                                        processed_at);
+
+            -- Records that failed validation or were refused by Postgres
+            CREATE TABLE IF NOT EXISTS raw.image_detection_rejects (
+                id SERIAL PRIMARY KEY,
+                record JSONB,
+                error TEXT,
+                source_file TEXT,
+                rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            -- Byte offset up to which each append-only store has been loaded
+            CREATE TABLE IF NOT EXISTS raw.detection_load_state (
+                source_file TEXT PRIMARY KEY,
+                byte_offset BIGINT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
         """)
     conn.commit()
 
 
-def load_detection_json(file_path, conn):
-    """Load detection results from a JSON file into the database, skipping duplicates."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            detections = json.load(f)
-    except Exception as e:
-        print(f"Failed to read JSON file {file_path}: {e}")
-        return 0
+DETECTION_COLUMNS = (
+    "message_id, detected_object_class, confidence_score, "
+    "image_filename, relative_path, processed_at, channel_name"
+)
+
+
+def parse_detection(det):
+    """Validate a detection record and return it as a row tuple in DETECTION_COLUMNS order."""
+    return (
+        int(det['message_id']),
+        str(det['detected_object_class']),
+        float(det['confidence_score']),
+        str(det['image_filename']),
+        str(det['relative_path']),
+        datetime.fromisoformat(det['processed_at']).isoformat(),
+        detection_channel(det['relative_path'])
+    )
+
+
+def reject_records(cursor, rejects, source_file):
+    """Quarantine (record, error) pairs into raw.image_detection_rejects."""
+    if not rejects:
+        return
+    execute_values(cursor, """
+        INSERT INTO raw.image_detection_rejects (record, error, source_file)
+        VALUES %s
+    """, [(json.dumps(det, default=str), error, source_file) for det, error in rejects])
+
+
+def copy_and_merge(cursor, rows):
+    """COPY rows into a temp table and merge them in one statement, returning the inserted count."""
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS tmp_image_detections (
+            message_id INTEGER,
+            detected_object_class VARCHAR(255),
+            confidence_score REAL,
+            image_filename VARCHAR(255),
+            relative_path TEXT,
+            processed_at TIMESTAMP,
+            channel_name TEXT
+        ) ON COMMIT DROP;
+    """)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY tmp_image_detections ({DETECTION_COLUMNS}) FROM STDIN WITH (FORMAT csv)", buffer)
+    # loaded_at is the insert time, not the transaction start (see raw_load_lock.py)
+    cursor.execute(f"""
+        INSERT INTO raw.image_detections ({DETECTION_COLUMNS}, loaded_at)
+        SELECT DISTINCT ON (channel_name, message_id, image_filename, detected_object_class)
+            {DETECTION_COLUMNS}, clock_timestamp()
+        FROM tmp_image_detections t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM raw.image_detections d
+            WHERE d.channel_name = t.channel_name
+              AND d.message_id = t.message_id
+              AND d.image_filename = t.image_filename
+              AND d.detected_object_class = t.detected_object_class
+        )
+        ORDER BY channel_name, message_id, image_filename, detected_object_class, processed_at
+        ON CONFLICT (channel_name, message_id, image_filename, detected_object_class, processed_at) DO NOTHING
+    """)
+    inserted = cursor.rowcount
+    cursor.execute("TRUNCATE tmp_image_detections")
+    return inserted
+
+
+def insert_rows_individually(cursor, rows, records):
+    """Fallback when the bulk merge is refused: insert row by row, each under its own savepoint.
 
-    count = 0
+    Returns (inserted, rejects) where rejects are the (record, error) pairs Postgres refused.
+    """
+    inserted = 0
+    rejects = []
+    for row, det in zip(rows, records):
+        cursor.execute("SAVEPOINT detection_row")
+        try:
+            cursor.execute(f"""
+                INSERT INTO raw.image_detections ({DETECTION_COLUMNS}, loaded_at)
+                SELECT %s, %s, %s, %s, %s, %s, %s, clock_timestamp()
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM raw.image_detections
+                    WHERE channel_name = %s AND message_id = %s AND image_filename = %s
+                      AND detected_object_class = %s
+                )
+                ON CONFLICT (channel_name, message_id, image_filename, detected_object_class, processed_at)
+                DO NOTHING
+            """, row + (row[6], row[0], row[3], row[1]))
+            inserted += cursor.rowcount
+            cursor.execute("RELEASE SAVEPOINT detection_row")
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT detection_row")
+            rejects.append((det, str(e).strip()))
+    return inserted, rejects
+
+
+def get_load_offset(cursor, source_file):
+    """Return the byte offset already loaded from source_file (0 if never loaded)."""
+    cursor.execute("""
+        SELECT byte_offset FROM raw.detection_load_state WHERE source_file = %s
+    """, (source_file,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def set_load_offset(cursor, source_file, byte_offset):
+    """Record how far source_file has been loaded, in the same transaction as its rows."""
+    cursor.execute("""
+        INSERT INTO raw.detection_load_state (source_file, byte_offset)
+        VALUES (%s, %s)
+        ON CONFLICT (source_file) DO UPDATE SET
+            byte_offset = EXCLUDED.byte_offset,
+            updated_at = CURRENT_TIMESTAMP
+    """, (source_file, byte_offset))
+
+
+def merge_batch(cursor, detections):
+    """Validate and merge one batch of records, returning (inserted, rejects)."""
+    rows = []
+    records = []
+    rejects = []
     for det in detections:
         try:
-            with conn.cursor() as cursor:
-                processed_at = datetime.fromisoformat(det['processed_at'])
-                cursor.execute("""
-                    INSERT INTO raw.image_detections
-                        (message_id, detected_object_class, confidence_score, image_filename, relative_path, processed_at)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (message_id, image_filename, detected_object_class) DO NOTHING
-                """, (
-                    det['message_id'],
-                    det['detected_object_class'],
-                    det['confidence_score'],
-                    det['image_filename'],
-                    det['relative_path'],
-                    processed_at
-                ))
-                if cursor.rowcount > 0:
-                    count += 1
-        except Exception as e:
-            print(f"Skipping a record due to error: {e}")
-            conn.rollback()  # Important: Rollback to recover from failure
+            rows.append(parse_detection(det))
+            records.append(det)
+        except (KeyError, TypeError, ValueError) as e:
+            rejects.append((det, f"{type(e).__name__}: {e}"))
+
+    inserted = 0
+    if rows:
+        ensure_monthly_partitions(cursor, 'image_detections',
+                                  (datetime.fromisoformat(row[5]) for row in rows))
+        # The detection key is only unique per partition (it can't include
+        # processed_at), so NOT EXISTS is what dedupes; two loaders running at
+        # once would both pass it. Merges are serialized until commit, and each
+        # INSERT's fresh snapshot then sees what the previous loader committed.
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (DETECTION_MERGE_LOCK,))
+        cursor.execute("SAVEPOINT detection_batch")
+        try:
+            inserted = copy_and_merge(cursor, rows)
+            cursor.execute("RELEASE SAVEPOINT detection_batch")
+        except psycopg2.Error as e:
+            print(f"Bulk merge failed ({str(e).strip()}), retrying row by row")
+            cursor.execute("ROLLBACK TO SAVEPOINT detection_batch")
+            inserted, db_rejects = insert_rows_individually(cursor, rows, records)
+            rejects.extend(db_rejects)
+    return inserted, rejects
+
+
+def load_detection_json(file_path, conn, batch_size=DEFAULT_BATCH_SIZE):
+    """Load new detection results from the JSON Lines store into the database, skipping duplicates.
+
+    Only the records appended since the last load are read: the byte offset
+    reached is stored in raw.detection_load_state and committed together with
+    the rows. Valid records are COPYed into a temp table and merged with a
+    single ON CONFLICT DO NOTHING insert per batch. Records that fail
+    validation, or that Postgres refuses, are written to
+    raw.image_detection_rejects instead of aborting the load.
+    """
+    file_path = str(file_path)
+    source_file = os.path.basename(file_path)
+    total = inserted = rejected = 0
+
+    with conn.cursor() as cursor:
+        # Held until the commit below, so this load never straddles a dbt run
+        lock_for_load(cursor)
+        offset = get_load_offset(cursor, source_file)
+        if offset > os.path.getsize(file_path):
+            print(f"{file_path} is smaller than the stored offset, reloading from the start")
+            offset = 0
+        start_offset = offset
 
+        batch = []
+        for offset_after, det in iter_detections_from(offset, file_path):
+            batch.append(det)
+            offset = offset_after
+            if len(batch) >= batch_size:
+                batch_inserted, rejects = merge_batch(cursor, batch)
+                reject_records(cursor, rejects, file_path)
+                total += len(batch)
+                inserted += batch_inserted
+                rejected += len(rejects)
+                batch = []
+
+        if batch:
+            batch_inserted, rejects = merge_batch(cursor, batch)
+            reject_records(cursor, rejects, file_path)
+            total += len(batch)
+            inserted += batch_inserted
+            rejected += len(rejects)
+
+        set_load_offset(cursor, source_file, offset)
     conn.commit()
-    print(f"Successfully inserted {count} new detections from {file_path}")
-    return count
+    instrumentation.count("detection_loader", "records_read", total)
+    instrumentation.count("detection_loader", "rows_inserted", inserted)
+    instrumentation.count("detection_loader", "rows_rejected", rejected)
+    instrumentation.add_bytes("detection_loader", offset - start_offset)
 
-if __name__ == "__main__":
-    detection_json_path = os.path.join('data', 'raw', 'detected_images', 'image_detections.json')
+    duplicates = total - inserted - rejected
+    print(f"Successfully inserted {inserted} new detections from {file_path} "
+          f"({duplicates} duplicates, {rejected} rejected)")
+    return inserted
 
-    if not os.path.exists(detection_json_path):
-        print(f"Detection JSON file not found at: {detection_json_path}")
-        exit(1)
+def load_detections(store_path=DETECTIONS_JSONL, batch_size=DEFAULT_BATCH_SIZE):
+    """Create the tables if needed and load what was appended to the store since the last load.
 
+    The tables are created even when there is no store yet (no photos
+    detected so far), since the dbt sources read them. Returns the number of
+    new detections inserted.
+    """
+    migrate_legacy_json()
     conn = get_db_connection()
     try:
         create_detections_table(conn)
-        load_detection_json(detection_json_path, conn)
+        if not os.path.exists(store_path):
+            print(f"Detection JSON file not found at: {store_path}")
+            return 0
+        with instrumentation.timed("detection_loader", "load"):
+            return load_detection_json(store_path, conn, batch_size)
     finally:
         conn.close()
+
+if __name__ == "__main__":
+    migrate_legacy_json()
+    detection_json_path = str(DETECTIONS_JSONL)
+
+    if not os.path.exists(detection_json_path):
+        print(f"Detection JSON file not found at: {detection_json_path}")
+        exit(1)
+
+    load_detections(detection_json_path)
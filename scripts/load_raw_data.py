@@ -1,15 +1,35 @@
 import os
+import io
+import csv
 import json
+import time
+import argparse
+import xxhash
 import psycopg2
+import pyarrow as pa
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from raw_partitions import convert_to_partitioned, ensure_monthly_partitions, is_unpartitioned
+import instrumentation
+from raw_load_lock import lock_for_load
+from message_segments import MESSAGE_FILE_EXTENSIONS, iter_message_batches
 from dotenv import load_dotenv
 from datetime import datetime
 
 # Load environment variables
 load_dotenv('.env')
 
-def get_db_connection():
-    """Establish database connection using environment variables"""
-    return psycopg2.connect(
+RAW_DATA_ROOT = os.path.join('data', 'raw', 'telegram_messages')
+
+# Number of messages streamed to Postgres per COPY round trip
+DEFAULT_BATCH_SIZE = 5000
+
+# Bytes read at a time when hashing a file for the manifest
+HASH_CHUNK_SIZE = 1 << 20
+
+def get_db_params():
+    """Connection parameters read from environment variables"""
+    return dict(
         host=os.getenv('DB_HOST'),
         database=os.getenv('POSTGRES_DB'),
         user=os.getenv('POSTGRES_USER'),
@@ -17,31 +37,248 @@ def get_db_connection():
         port=os.getenv('DB_PORT', '5432')
     )
 
+def get_db_connection():
+    """Establish database connection using environment variables"""
+    return psycopg2.connect(**get_db_params())
+
+def get_connection_pool(size):
+    """Thread-safe pool holding up to `size` connections for parallel file loads"""
+    return ThreadedConnectionPool(1, size, **get_db_params())
+
+MESSAGES_TABLE_COLUMNS = (
+    "id", "message_data", "scrape_date", "channel_name", "message_id",
+    "message_timestamp", "views", "sender_id", "has_image", "loaded_at"
+)
+
+# Range-partitioned by month of scrape_date (see raw_partitions.py); keys and
+# unique indexes on a partitioned table must include the partition column
+MESSAGES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS raw.telegram_messages (
+    id SERIAL,
+    message_data JSONB,
+    scrape_date DATE NOT NULL,
+    channel_name VARCHAR(255),
+    message_id BIGINT,
+    message_timestamp TIMESTAMP,
+    views INTEGER,
+    sender_id BIGINT,
+    has_image BOOLEAN,
+    loaded_at TIMESTAMP DEFAULT clock_timestamp(),
+    PRIMARY KEY (id, scrape_date)
+) PARTITION BY RANGE (scrape_date)
+"""
+
+def upgrade_unpartitioned_table(cursor):
+    """One-time fixes for heap tables created by older loaders, before they are partitioned"""
+    cursor.execute("ALTER TABLE raw.telegram_messages ADD COLUMN IF NOT EXISTS message_id BIGINT")
+
+    # Tables created before message_id was a column need it backfilled and
+    # de-duplicated once
+    cursor.execute("SELECT to_regclass('raw.uniq_channel_message')")
+    if cursor.fetchone()[0] is None:
+        cursor.execute("""
+        UPDATE raw.telegram_messages
+        SET message_id = (message_data->>'message_id')::BIGINT
+        WHERE message_id IS NULL AND message_data ? 'message_id';
+
+        DELETE FROM raw.telegram_messages a
+        USING raw.telegram_messages b
+        WHERE a.channel_name = b.channel_name
+          AND a.message_id = b.message_id
+          AND a.id > b.id;
+        """)
+
+    # Typed copies of the JSONB fields downstream models filter and join on;
+    # tables created before they existed get them added and backfilled once
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'raw' AND table_name = 'telegram_messages'
+          AND column_name = 'message_timestamp'
+    """)
+    if cursor.fetchone() is None:
+        cursor.execute("""
+        ALTER TABLE raw.telegram_messages
+            ADD COLUMN message_timestamp TIMESTAMP,
+            ADD COLUMN views INTEGER,
+            ADD COLUMN sender_id BIGINT,
+            ADD COLUMN has_image BOOLEAN;
+
+        UPDATE raw.telegram_messages SET
+            message_timestamp = (message_data->>'timestamp')::TIMESTAMP,
+            views = (message_data->>'views')::INTEGER,
+            sender_id = (message_data->>'sender_id')::BIGINT,
+            has_image = message_data->>'image_path' IS NOT NULL;
+        """)
+
 def create_raw_schema(conn):
-    """Create the raw schema and table if they don't exist"""
+    """Create the raw schema and the partitioned messages table if they don't exist
+
+    A heap raw.telegram_messages left by an older loader is upgraded and
+    rebuilt as a partitioned table once, in this transaction.
+    """
     with conn.cursor() as cursor:
         cursor.execute("""
         CREATE SCHEMA IF NOT EXISTS raw;
-        CREATE TABLE IF NOT EXISTS raw.telegram_messages (
-            id SERIAL PRIMARY KEY,
-            message_data JSONB,
-            scrape_date DATE,
-            channel_name VARCHAR(255),
+
+        CREATE TABLE IF NOT EXISTS raw.load_manifest (
+            relative_path TEXT PRIMARY KEY,
+            file_size BIGINT,
+            file_mtime DOUBLE PRECISION,
+            content_hash VARCHAR(16),
+            message_count INTEGER,
             loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        """)
+
+        if is_unpartitioned(cursor, 'telegram_messages'):
+            upgrade_unpartitioned_table(cursor)
+            convert_to_partitioned(cursor, 'telegram_messages', MESSAGES_TABLE_SQL,
+                                   'scrape_date', MESSAGES_TABLE_COLUMNS)
+
+        cursor.execute(MESSAGES_TABLE_SQL)
+        cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_channel_name ON raw.telegram_messages(channel_name);
         CREATE INDEX IF NOT EXISTS idx_scrape_date ON raw.telegram_messages(scrape_date);
+        -- Incremental dbt runs select rows loaded since their last run
+        CREATE INDEX IF NOT EXISTS idx_messages_loaded_at ON raw.telegram_messages(loaded_at);
+        CREATE UNIQUE INDEX IF NOT EXISTS uniq_channel_message
+            ON raw.telegram_messages(channel_name, message_id, scrape_date);
         """)
     conn.commit()
 
-def process_json_file(file_path, conn, data_root):
-    """Process a single JSON file and load its contents to the database"""
+def create_staging_table(conn):
+    """Create the session-local table COPY batches are streamed into before merging"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS tmp_telegram_messages (
+            message_data JSONB,
+            scrape_date DATE,
+            channel_name VARCHAR(255),
+            message_id BIGINT,
+            message_timestamp TIMESTAMP,
+            views INTEGER,
+            sender_id BIGINT,
+            has_image BOOLEAN
+        ) ON COMMIT DELETE ROWS;
+        """)
+
+MESSAGE_COLUMNS = (
+    "message_data, scrape_date, channel_name, message_id, "
+    "message_timestamp, views, sender_id, has_image"
+)
+
+def message_row(message, scrape_date, channel_name):
+    """Build a COPY row in MESSAGE_COLUMNS order, with typed columns pulled out of the message"""
+    return (
+        json.dumps(message),
+        scrape_date.isoformat(),
+        channel_name,
+        message.get('message_id'),
+        message.get('timestamp'),
+        message.get('views'),
+        message.get('sender_id'),
+        message.get('image_path') is not None
+    )
+
+# A reloaded file never takes an image_path away: segments of one channel-day
+# load in parallel, so an older segment written before its photos landed can
+# be applied after the rewrite that has them
+MERGED_MESSAGE_DATA = """
+    CASE
+        WHEN EXCLUDED.message_data ->> 'image_path' IS NULL
+         AND raw.telegram_messages.message_data ->> 'image_path' IS NOT NULL
+        THEN EXCLUDED.message_data
+             || jsonb_build_object('image_path', raw.telegram_messages.message_data -> 'image_path')
+        ELSE EXCLUDED.message_data
+    END
+"""
+
+def copy_messages_batch(cursor, rows):
+    """COPY a batch of rows into the staging table and merge new ones into raw.telegram_messages.
+
+    Returns the number of rows inserted or changed; rows whose (channel_name, message_id)
+    already exist in the same scrape_date with identical data are skipped by ON CONFLICT. Changed rows
+    (e.g. an image_path filled in after a late download) are updated in place. scrape_metadata is
+    left out of the comparison and null fields count as missing (JSONL segments omit image_path,
+    Parquet ones store it as null): a message that only moved to another file (a compacted
+    segment) keeps its row and loaded_at, so downstream incremental models don't recompute it.
+    A stored image_path is kept when the incoming copy of the message has none (MERGED_MESSAGE_DATA).
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    cursor.copy_expert(f"""
+        COPY tmp_telegram_messages ({MESSAGE_COLUMNS})
+        FROM STDIN WITH (FORMAT csv)
+    """, buffer)
+    # loaded_at is the insert time, not the transaction start (see raw_load_lock.py)
+    cursor.execute(f"""
+        INSERT INTO raw.telegram_messages ({MESSAGE_COLUMNS}, loaded_at)
+        SELECT DISTINCT ON (channel_name, message_id) {MESSAGE_COLUMNS}, clock_timestamp()
+        FROM tmp_telegram_messages
+        ORDER BY channel_name, message_id
+        ON CONFLICT (channel_name, message_id, scrape_date) DO UPDATE SET
+            message_data = {MERGED_MESSAGE_DATA},
+            message_timestamp = EXCLUDED.message_timestamp,
+            views = EXCLUDED.views,
+            sender_id = EXCLUDED.sender_id,
+            has_image = EXCLUDED.has_image OR raw.telegram_messages.has_image,
+            loaded_at = clock_timestamp()
+        WHERE jsonb_strip_nulls(raw.telegram_messages.message_data - 'scrape_metadata')
+            IS DISTINCT FROM jsonb_strip_nulls(({MERGED_MESSAGE_DATA}) - 'scrape_metadata')
+    """)
+    inserted = cursor.rowcount
+    cursor.execute("TRUNCATE tmp_telegram_messages")
+    return inserted
+
+def fetch_manifest(conn):
+    """Return {relative_path: (file_size, file_mtime, content_hash)} for every loaded file"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT relative_path, file_size, file_mtime, content_hash
+            FROM raw.load_manifest
+        """)
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def record_manifest(conn, relative_path, file_size, file_mtime, content_hash, message_count):
+    """Insert or refresh the manifest entry for a loaded file"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO raw.load_manifest
+                (relative_path, file_size, file_mtime, content_hash, message_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (relative_path) DO UPDATE SET
+                file_size = EXCLUDED.file_size,
+                file_mtime = EXCLUDED.file_mtime,
+                content_hash = EXCLUDED.content_hash,
+                message_count = COALESCE(EXCLUDED.message_count, raw.load_manifest.message_count),
+                loaded_at = CURRENT_TIMESTAMP
+        """, (relative_path, file_size, file_mtime, content_hash, message_count))
+
+def file_content_hash(file_path):
+    """xxh64 of a file's bytes, read HASH_CHUNK_SIZE at a time"""
+    digest = xxhash.xxh64()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def process_message_file(file_path, conn, data_root, batch_size=DEFAULT_BATCH_SIZE, manifest=None):
+    """Process a single message file (Parquet or JSONL segment, or legacy JSON) and load it to the database
+
+    Messages are streamed batch_size at a time from file to COPY, so memory
+    stays flat however large the file. Files whose size/mtime (or, failing
+    that, content hash) match their manifest entry are skipped. Files rewritten
+    since the last load (a segment updated with late image paths, a compacted
+    segment) are loaded again; ON CONFLICT keeps only the messages that are new or changed.
+    """
 
     # Get relative path from data_root, normalize to forward slashes
     relative_path = os.path.relpath(file_path, data_root).replace('\\', '/')
 
     # Extract date and channel from the relative path parts
-    # Assuming folder structure: <scrape_date>/<channel_name>/<file.json>
+    # Assuming folder structure: <scrape_date>/<channel_name>/<file>
     path_parts = relative_path.split('/')
     if len(path_parts) < 3:
         print(f"Skipping file with unexpected path format: {relative_path}")
@@ -56,66 +293,172 @@ def process_json_file(file_path, conn, data_root):
         print(f"Invalid scrape date format in path: {scrape_date_str}")
         return 0
 
-    with conn.cursor() as cursor:
-        # Check if this file (by relative path) has already been loaded
-        cursor.execute("""
-            SELECT 1 FROM raw.telegram_messages
-            WHERE message_data->'scrape_metadata'->>'source_path' = %s
-            LIMIT 1
-        """, (relative_path,))
-        if cursor.fetchone():
-            print(f"Skipping already loaded file: {relative_path}")
-            return 0
+    manifest = manifest if manifest is not None else {}
+    entry = manifest.get(relative_path)
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            messages = json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError) as e:
+        stat = os.stat(file_path)
+    except FileNotFoundError as e:
         print(f"Error processing {relative_path}: {e}")
         return 0
 
-    with conn.cursor() as cursor:
-        for message in messages:
-            # Add metadata including full relative path to uniquely identify source file
-            message['scrape_metadata'] = {
-                'scrape_date': scrape_date.isoformat(),
-                'channel_name': channel_name,
-                'source_path': relative_path
-            }
+    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+        instrumentation.count("message_loader", "files_skipped")
+        print(f"Skipping already loaded file: {relative_path}")
+        return 0
+
+    try:
+        content_hash = file_content_hash(file_path)
+    except FileNotFoundError as e:
+        print(f"Error processing {relative_path}: {e}")
+        return 0
+
+    if entry and entry[2] == content_hash:
+        # Touched but not modified, refresh size/mtime so the next run skips on stat alone
+        record_manifest(conn, relative_path, stat.st_size, stat.st_mtime, content_hash, None)
+        instrumentation.count("message_loader", "files_skipped")
+        print(f"Skipping unchanged file: {relative_path}")
+        return 0
 
-            cursor.execute("""
-                INSERT INTO raw.telegram_messages 
-                    (message_data, scrape_date, channel_name) 
-                VALUES (%s, %s, %s)
-            """,
-            (json.dumps(message), scrape_date, channel_name))
+    if entry:
+        print(f"Reloading changed file: {relative_path}")
 
-    print(f"Loaded {len(messages)} messages from {relative_path}")
-    return len(messages)
+    create_staging_table(conn)
+    start = time.perf_counter()
+    inserted = 0
+    message_count = 0
+
+    try:
+        with conn.cursor() as cursor:
+            # Held until the caller commits, so this file never straddles a dbt run
+            lock_for_load(cursor)
+            for messages in iter_message_batches(file_path, batch_size):
+                rows = []
+                for message in messages:
+                    # Add metadata including full relative path to uniquely identify source file
+                    message['scrape_metadata'] = {
+                        'scrape_date': scrape_date.isoformat(),
+                        'channel_name': channel_name,
+                        'source_path': relative_path
+                    }
+                    rows.append(message_row(message, scrape_date, channel_name))
+                with instrumentation.timed("message_loader", "copy_batch"):
+                    inserted += copy_messages_batch(cursor, rows)
+                message_count += len(rows)
+    except (json.JSONDecodeError, UnicodeDecodeError, pa.ArrowException) as e:
+        # Nothing from a corrupt file is kept; the caller rolls back and the
+        # file is tried again on the next run
+        raise ValueError(f"Error processing {relative_path}: {e}") from e
 
-def load_scraped_data(data_root):
-    """Main function to load all scraped data"""
-    conn = get_db_connection()
-    create_raw_schema(conn)
+    record_manifest(conn, relative_path, stat.st_size, stat.st_mtime, content_hash, message_count)
+    instrumentation.count("message_loader", "files_loaded")
+    instrumentation.count("message_loader", "messages_read", message_count)
+    instrumentation.count("message_loader", "rows_inserted", inserted)
+    instrumentation.add_bytes("message_loader", stat.st_size)
 
-    total_messages = 0
-    processed_files = 0
+    elapsed = time.perf_counter() - start
+    rate = message_count / elapsed if elapsed > 0 else 0
+    print(f"Loaded {inserted} new or changed of {message_count} messages from {relative_path} "
+          f"in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return inserted
 
-    for root, _, files in os.walk(data_root):
+def iter_message_files(data_root, scrape_date=None):
+    """Yield every scraped message file below data_root, or only below its scrape_date folder"""
+    search_root = data_root if scrape_date is None else os.path.join(data_root, scrape_date)
+    for root, _, files in os.walk(search_root):
         for file in files:
-            if file.endswith('.json'):
-                file_path = os.path.join(root, file)
-                count = process_json_file(file_path, conn, data_root)
+            if file.endswith(MESSAGE_FILE_EXTENSIONS):
+                yield os.path.join(root, file)
+
+def file_scrape_date(file_path, data_root):
+    """The scrape date encoded in a file's <scrape_date>/<channel_name>/ folder, or None"""
+    scrape_date_str = os.path.relpath(file_path, data_root).replace('\\', '/').split('/')[0]
+    try:
+        return datetime.strptime(scrape_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def load_file_with_pool(pool, file_path, data_root, batch_size, manifest):
+    """Load one file on a pooled connection and commit it on its own
+
+    Committing per file means an interrupted run keeps everything loaded so far;
+    the manifest row is written in the same transaction, so a failed file is
+    simply picked up again next time.
+    """
+    conn = pool.getconn()
+    try:
+        count = process_message_file(file_path, conn, data_root, batch_size, manifest)
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+def load_scraped_data(data_root, batch_size=DEFAULT_BATCH_SIZE, workers=1, scrape_date=None):
+    """Main function to load all scraped data
+
+    With workers > 1 files are fanned out to a thread pool; psycopg2 releases
+    the GIL while Postgres parses and indexes each COPY batch, so the server
+    side of every file load runs in parallel. scrape_date (YYYY-MM-DD)
+    limits the load to that day's folder. Returns the file and message counts.
+    """
+    files = list(iter_message_files(data_root, scrape_date))
+    pool = get_connection_pool(workers)
+    try:
+        conn = pool.getconn()
+        try:
+            create_raw_schema(conn)
+            # Partitions are created up front so parallel file loads never race for them
+            with conn.cursor() as cursor:
+                ensure_monthly_partitions(cursor, 'telegram_messages',
+                                          filter(None, (file_scrape_date(path, data_root) for path in files)))
+            conn.commit()
+            manifest = fetch_manifest(conn)
+        finally:
+            pool.putconn(conn)
+
+        total_messages = 0
+        processed_files = 0
+        failed_files = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(load_file_with_pool, pool, file_path, data_root, batch_size, manifest): file_path
+                for file_path in files
+            }
+            for future in as_completed(futures):
+                try:
+                    count = future.result()
+                except Exception as e:
+                    failed_files += 1
+                    print(f"Failed to load {futures[future]}: {e}")
+                    continue
                 if count > 0:
                     total_messages += count
                     processed_files += 1
                     if processed_files % 10 == 0:
                         print(f"Processed {processed_files} files ({total_messages} messages)")
-
-    conn.commit()
-    conn.close()
-    print(f"\nFinished! Processed {processed_files} files with {total_messages} total messages.")
+    finally:
+        pool.closeall()
+    elapsed = time.perf_counter() - start
+    rate = total_messages / elapsed if elapsed > 0 else 0
+    print(f"\nFinished! Processed {processed_files} files with {total_messages} total messages "
+          f"in {elapsed:.2f}s ({rate:.0f} rows/sec, {workers} workers).")
+    if failed_files:
+        print(f"{failed_files} files failed and will be retried on the next run.")
+    return {"files": processed_files, "messages": total_messages, "failed_files": failed_files}
 
 if __name__ == "__main__":
-    data_root = os.path.join('data', 'raw', 'telegram_messages')
-    load_scraped_data(data_root)
+    parser = argparse.ArgumentParser(description="Load scraped Telegram message files into raw.telegram_messages")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Messages per COPY batch")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of files loaded in parallel, each on its own connection")
+    parser.add_argument('--date', default=None,
+                        help="Only load the files scraped into this day's folder (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    load_scraped_data(RAW_DATA_ROOT, batch_size=args.batch_size, workers=args.workers, scrape_date=args.date)
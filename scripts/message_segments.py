@@ -0,0 +1,123 @@
+import os
+import json
+import time
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Each scrape run appends its own segment file to <date>/<channel>/ instead of
+# rewriting a shared per-day JSON array:
+#   <channel>-<run_id>.parquet (default) or <channel>-<run_id>.jsonl
+# Files from before segments existed (<channel>.json) are still read.
+SEGMENT_FORMATS = ("parquet", "jsonl")
+SEGMENT_EXTENSIONS = tuple(f".{fmt}" for fmt in SEGMENT_FORMATS)
+MESSAGE_FILE_EXTENSIONS = (".json",) + SEGMENT_EXTENSIONS
+
+SEGMENT_SCHEMA = pa.schema([
+    ("channel", pa.string()),
+    ("message_id", pa.int64()),
+    ("sender_id", pa.int64()),
+    ("message_content", pa.string()),
+    ("timestamp", pa.string()),
+    ("views", pa.int64()),
+    ("image_path", pa.string()),
+])
+
+
+def new_run_id():
+    """Sortable, unique-per-process id for a segment file name."""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+
+
+def segment_path(channel_dir, channel_clean, run_id, fmt="parquet"):
+    return os.path.join(channel_dir, f"{channel_clean}-{run_id}.{fmt}")
+
+
+def write_segment(path, messages):
+    """Write messages to a segment, replacing it atomically if it already exists."""
+    tmp_path = f"{path}.tmp"
+    if path.endswith(".parquet"):
+        pq.write_table(pa.Table.from_pylist(messages, schema=SEGMENT_SCHEMA), tmp_path)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+
+
+def iter_message_batches(path, batch_size):
+    """Yield lists of at most batch_size message dicts from any message file.
+
+    Parquet is read one record batch at a time and JSONL one line at a time,
+    so memory stays flat however large the file. Legacy .json arrays have to
+    be parsed whole.
+    """
+    if path.endswith(".parquet"):
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield record_batch.to_pylist()
+    elif path.endswith(".jsonl"):
+        batch = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            messages = json.load(f)
+        for start in range(0, len(messages), batch_size):
+            yield messages[start:start + batch_size]
+
+
+def list_message_files(channel_dir, extensions=MESSAGE_FILE_EXTENSIONS):
+    if not os.path.isdir(channel_dir):
+        return []
+    return sorted(
+        os.path.join(channel_dir, name) for name in os.listdir(channel_dir)
+        if name.endswith(extensions)
+    )
+
+
+def read_message_ids(channel_dir):
+    """Message ids already stored for one channel and day, across all its files."""
+    ids = set()
+    for path in list_message_files(channel_dir):
+        if path.endswith(".parquet"):
+            ids.update(pq.read_table(path, columns=["message_id"]).column("message_id").to_pylist())
+        else:
+            for batch in iter_message_batches(path, 10000):
+                ids.update(message['message_id'] for message in batch)
+    return ids
+
+
+def compact_channel_dir(channel_dir, channel_clean, min_age=600, fmt="parquet"):
+    """Merge one channel-day's segments into a single segment and delete the inputs.
+
+    Segments modified in the last min_age seconds are left alone, since a
+    running scrape may still rewrite them once its images land. When a
+    message appears in several segments, the most recently written one wins.
+    Returns the number of segments merged (0 when there was nothing to do).
+    """
+    now = time.time()
+    segments = [
+        path for path in list_message_files(channel_dir, SEGMENT_EXTENSIONS)
+        if now - os.path.getmtime(path) >= min_age
+    ]
+    if len(segments) < 2:
+        return 0
+
+    latest = {}
+    for path in sorted(segments, key=os.path.getmtime):
+        for batch in iter_message_batches(path, 10000):
+            for message in batch:
+                latest[message['message_id']] = message
+
+    write_segment(segment_path(channel_dir, channel_clean, f"compacted-{new_run_id()}", fmt),
+                  sorted(latest.values(), key=lambda message: message['message_id']))
+    for path in segments:
+        os.remove(path)
+    return len(segments)
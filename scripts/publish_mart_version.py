@@ -0,0 +1,37 @@
+from load_raw_data import get_db_connection
+
+# Schema the API reads the marts from (api/models.py)
+MART_SCHEMA = "dbt_telegram_mart"
+
+def publish_mart_version(conn):
+    """Bump the single-row mart version marker after a successful dbt run.
+
+    The API keys its response cache on this value, so bumping it makes every
+    cached response computed from the previous marts stale.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+        CREATE SCHEMA IF NOT EXISTS {MART_SCHEMA};
+        CREATE TABLE IF NOT EXISTS {MART_SCHEMA}.mart_version (
+            id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            version BIGINT NOT NULL,
+            published_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO {MART_SCHEMA}.mart_version (id, version)
+        VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE
+        SET version = {MART_SCHEMA}.mart_version.version + 1,
+            published_at = CURRENT_TIMESTAMP
+        RETURNING version;
+        """)
+        version = cursor.fetchone()[0]
+    conn.commit()
+    return version
+
+if __name__ == "__main__":
+    conn = get_db_connection()
+    try:
+        version = publish_mart_version(conn)
+        print(f"Published mart version {version}")
+    finally:
+        conn.close()
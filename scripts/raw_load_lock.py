@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+# Incremental dbt models select raw rows with loaded_at >= the newest loaded_at
+# they already hold. A load that commits while dbt runs could carry an older
+# loaded_at than dbt saw and be skipped for good, so loads share this advisory
+# lock until they commit, dbt runs hold it exclusively, and loaders stamp
+# loaded_at with clock_timestamp() once the lock is held.
+RAW_LOAD_LOCK = "raw loads"
+
+
+def lock_for_load(cursor):
+    """Share the raw-load lock until the caller's transaction ends; waits while dbt holds it."""
+    cursor.execute("SELECT pg_advisory_xact_lock_shared(hashtext(%s))", (RAW_LOAD_LOCK,))
+
+
+@contextmanager
+def exclusive_raw_loads(conn):
+    """Hold the raw-load lock exclusively for the block, on conn's session.
+
+    Waits for running loads to commit and keeps new ones out until the block exits.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (RAW_LOAD_LOCK,))
+    conn.commit()
+    try:
+        yield
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (RAW_LOAD_LOCK,))
+        conn.commit()
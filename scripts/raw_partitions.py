@@ -0,0 +1,105 @@
+import re
+from datetime import date
+
+# Monthly partitions are named <table>_yYYYYmMM, e.g. raw.telegram_messages_y2025m07
+PARTITION_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def ensure_monthly_partitions(cursor, table, days):
+    """Create raw.<table>'s monthly partitions covering `days`, skipping those that exist.
+
+    Existence is checked first so the common case takes no lock on the parent.
+    The caller commits. Returns the names of the partitions created.
+    """
+    created = []
+    locked = False
+    for month in sorted({month_start(day) for day in days}):
+        name = partition_name(table, month)
+        cursor.execute("SELECT to_regclass(%s)", (f"raw.{name}",))
+        if cursor.fetchone()[0] is not None:
+            continue
+        if not locked:
+            # Loaders for different days may run at once; serialize creation
+            # and look again once the lock is held
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"raw.{table} partitions",))
+            locked = True
+            cursor.execute("SELECT to_regclass(%s)", (f"raw.{name}",))
+            if cursor.fetchone()[0] is not None:
+                continue
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS raw.{name}
+            PARTITION OF raw.{table}
+            FOR VALUES FROM (%s) TO (%s)
+        """, (month.isoformat(), next_month(month).isoformat()))
+        created.append(name)
+    return created
+
+
+def is_unpartitioned(cursor, table):
+    """True if raw.<table> exists as a plain heap table (created before partitioning)."""
+    cursor.execute("""
+        SELECT c.relkind = 'r'
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'raw' AND c.relname = %s
+    """, (table,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def convert_to_partitioned(cursor, table, create_sql, partition_key, columns):
+    """Rebuild a heap raw.<table> as the partitioned table `create_sql` defines, keeping its rows.
+
+    Runs inside the caller's transaction. Rows with a NULL partition key are
+    filed under the month they were loaded in. Indexes are left to the
+    caller, which creates them after the old table (and its index names) is gone.
+    """
+    legacy = f"{table}_unpartitioned"
+    key = f"COALESCE({partition_key}, loaded_at, CURRENT_TIMESTAMP)"
+    cursor.execute(f"ALTER TABLE raw.{table} RENAME TO {legacy}")
+    cursor.execute(create_sql)
+
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', {key})::date FROM raw.{legacy}")
+    ensure_monthly_partitions(cursor, table, [row[0] for row in cursor.fetchall()])
+
+    select_columns = ", ".join(key if column == partition_key else column for column in columns)
+    cursor.execute(f"""
+        INSERT INTO raw.{table} ({", ".join(columns)})
+        SELECT {select_columns} FROM raw.{legacy}
+    """)
+    moved = cursor.rowcount
+    cursor.execute(f"""
+        SELECT setval(pg_get_serial_sequence('raw.{table}', 'id'), COALESCE(MAX(id), 0) + 1, false)
+        FROM raw.{table}
+    """)
+    cursor.execute(f"DROP TABLE raw.{legacy}")
+    print(f"Converted raw.{table} to a partitioned table ({moved} rows moved)")
+
+
+def list_monthly_partitions(cursor, table):
+    """Return [(partition_name, month)] for raw.<table>'s attached monthly partitions, oldest first."""
+    cursor.execute("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_namespace n ON n.oid = parent.relnamespace
+        WHERE n.nspname = 'raw' AND parent.relname = %s
+    """, (table,))
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
@@ -0,0 +1,67 @@
+import argparse
+from datetime import date
+from load_raw_data import get_db_connection
+from raw_partitions import list_monthly_partitions, month_start, next_month
+
+# Raw tables partitioned by month (scrape_date and processed_at respectively)
+PARTITIONED_TABLES = ("telegram_messages", "image_detections")
+ARCHIVE_SCHEMA = "raw_archive"
+
+
+def cutoff_month(keep_months, today=None):
+    """First month to keep: the current month and the keep_months - 1 before it."""
+    month = month_start(today or date.today())
+    for _ in range(keep_months - 1):
+        month = date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+    return month
+
+
+def expire_partitions(conn, keep_months, drop=False, dry_run=False):
+    """Detach every monthly raw partition that ends before the retention window.
+
+    Detached partitions are moved to the raw_archive schema (or dropped with
+    drop=True). Either way only catalog entries change, so this is instant
+    regardless of partition size, unlike a DELETE. Returns the partitions expired.
+    """
+    cutoff = cutoff_month(keep_months)
+    expired = []
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        for table in PARTITIONED_TABLES:
+            for name, month in list_monthly_partitions(cursor, table):
+                if next_month(month) > cutoff:
+                    continue
+                expired.append(f"raw.{name}")
+                if dry_run:
+                    continue
+                cursor.execute(f"ALTER TABLE raw.{table} DETACH PARTITION raw.{name}")
+                if drop:
+                    cursor.execute(f"DROP TABLE raw.{name}")
+                else:
+                    cursor.execute(f"ALTER TABLE raw.{name} SET SCHEMA {ARCHIVE_SCHEMA}")
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    return expired
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detach raw partitions older than the retention window")
+    parser.add_argument('--keep-months', type=int, required=True,
+                        help="Months to keep, counting the current one")
+    parser.add_argument('--drop', action='store_true',
+                        help=f"Drop expired partitions instead of moving them to the {ARCHIVE_SCHEMA} schema")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the partitions that would expire")
+    args = parser.parse_args()
+    if args.keep_months < 1:
+        parser.error("--keep-months must be at least 1")
+
+    conn = get_db_connection()
+    try:
+        expired = expire_partitions(conn, args.keep_months, drop=args.drop, dry_run=args.dry_run)
+    finally:
+        conn.close()
+
+    action = "Would expire" if args.dry_run else ("Dropped" if args.drop else f"Archived to {ARCHIVE_SCHEMA}")
+    print(f"{action}: {', '.join(expired) if expired else 'nothing'}")
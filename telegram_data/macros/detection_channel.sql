@@ -0,0 +1,6 @@
+{% macro detection_channel(relative_path) %}
+    {#- Detection relative paths are <scrape_date>/<channel>/images/<message_id>.jpg
+        (backslash-separated when detection ran on Windows). Message ids are only
+        unique within a channel, so the channel is needed to join to the right message -#}
+    split_part(replace({{ relative_path }}, '\', '/'), '/', 2)
+{%- endmacro %}
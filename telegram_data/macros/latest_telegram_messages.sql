@@ -0,0 +1,18 @@
+{% macro latest_telegram_messages(loaded_after=none) %}
+    -- raw.telegram_messages can hold several rows for one (channel, message_id)
+    -- when a rewritten day file is reloaded; keep only the latest loaded version
+    SELECT *
+    FROM (
+        SELECT
+            *,
+            ROW_NUMBER() OVER (
+                PARTITION BY channel_name, message_id
+                ORDER BY loaded_at DESC, raw_id DESC
+            ) AS version_rank
+        FROM {{ ref('stg_telegram_messages') }}
+        {% if loaded_after is not none %}
+        WHERE loaded_at >= {{ loaded_after }}
+        {% endif %}
+    ) ranked
+    WHERE version_rank = 1
+{% endmacro %}
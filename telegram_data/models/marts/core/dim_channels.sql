@@ -1,10 +1,17 @@
 -- models/marts/core/dim_channels.sql
 
 {{ config(
-    materialized = 'table',
+    materialized = 'incremental',
+    unique_key = 'channel_id',
+    incremental_strategy = 'delete+insert',
     schema = 'mart'
 ) }}
 
-SELECT DISTINCT
-    channel_name AS channel_id
+SELECT
+    channel_name AS channel_id,
+    MAX(loaded_at) AS last_loaded_at
 FROM {{ ref('stg_telegram_messages') }}
+{% if is_incremental() %}
+WHERE loaded_at >= (SELECT COALESCE(MAX(last_loaded_at), '-infinity'::timestamp) FROM {{ this }})
+{% endif %}
+GROUP BY channel_name
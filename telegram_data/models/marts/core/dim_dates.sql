@@ -1,14 +1,21 @@
 -- models/marts/core/dim_dates.sql
 
 {{ config(
-    materialized = 'table',
+    materialized = 'incremental',
+    unique_key = 'date',
+    incremental_strategy = 'delete+insert',
     schema = 'mart'
 ) }}
 
 WITH dates AS (
-    SELECT DISTINCT
-        DATE(message_timestamp) AS date
+    SELECT
+        DATE(message_timestamp) AS date,
+        MAX(loaded_at) AS last_loaded_at
     FROM {{ ref('stg_telegram_messages') }}
+    {% if is_incremental() %}
+    WHERE loaded_at >= (SELECT COALESCE(MAX(last_loaded_at), '-infinity'::timestamp) FROM {{ this }})
+    {% endif %}
+    GROUP BY DATE(message_timestamp)
 )
 
 SELECT
@@ -18,5 +25,6 @@ SELECT
     EXTRACT(DAY FROM date) AS day,
     TO_CHAR(date, 'Day') AS day_of_week,
     TO_CHAR(date, 'Month') AS month_name,
-    CASE WHEN EXTRACT(ISODOW FROM date) < 6 THEN TRUE ELSE FALSE END AS is_weekday
+    CASE WHEN EXTRACT(ISODOW FROM date) < 6 THEN TRUE ELSE FALSE END AS is_weekday,
+    last_loaded_at
 FROM dates
@@ -0,0 +1,94 @@
+-- models/marts/core/fct_channel_images_daily.sql
+
+{{ config(
+    materialized = 'incremental',
+    unique_key = ['image_date', 'channel_id'],
+    incremental_strategy = 'delete+insert',
+    schema = 'mart',
+    post_hook = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS fct_channel_images_daily_channel_idx ON {{ this }} (channel_id, image_date)"
+    ]
+) }}
+
+-- Daily image-message counts per channel, with how many had any detection
+-- and how many had a pill detection (var pill_classes). Incremental runs
+-- recompute only the (channel, day) slices touched by new messages or new
+-- detections, found from the new rows alone, so a run costs what the new
+-- data touches rather than all history.
+{% set watermark = "(SELECT COALESCE(MAX(last_loaded_at), '-infinity'::timestamp) FROM " ~ this ~ ")" %}
+
+WITH
+{% if is_incremental() %}
+touched_slices AS (
+    SELECT channel_id, DATE(message_timestamp) AS image_date
+    FROM {{ ref('fct_messages') }}
+    WHERE has_image
+      AND loaded_at >= {{ watermark }}
+    UNION
+    SELECT messages.channel_id, DATE(messages.message_timestamp)
+    FROM {{ ref('fct_image_detections') }} AS detections
+    INNER JOIN {{ ref('fct_messages') }} AS messages
+      ON messages.message_id = detections.message_id
+     AND messages.channel_id = detections.channel_id
+    WHERE detections.loaded_at >= {{ watermark }}
+      AND messages.has_image
+),
+{% endif %}
+
+image_messages AS (
+    SELECT
+        messages.channel_id,
+        DATE(messages.message_timestamp) AS image_date,
+        messages.message_id,
+        messages.loaded_at
+    FROM {{ ref('fct_messages') }} AS messages
+    {% if is_incremental() %}
+    -- A range per slice, so the (channel_id, message_timestamp) index is used
+    INNER JOIN touched_slices
+      ON messages.channel_id = touched_slices.channel_id
+     AND messages.message_timestamp >= touched_slices.image_date
+     AND messages.message_timestamp < touched_slices.image_date + 1
+    {% endif %}
+    WHERE messages.has_image
+),
+
+-- Detections of the image messages in scope only, one row per message
+message_detections AS (
+    SELECT
+        detections.channel_id,
+        detections.message_id,
+        BOOL_OR(detections.detected_object_class IN (
+            {%- for class in var('pill_classes') %}
+            '{{ class }}'{% if not loop.last %},{% endif %}
+            {%- endfor %}
+        )) AS has_pill,
+        MAX(detections.loaded_at) AS loaded_at
+    FROM {{ ref('fct_image_detections') }} AS detections
+    INNER JOIN image_messages
+      ON image_messages.channel_id = detections.channel_id
+     AND image_messages.message_id = detections.message_id
+    GROUP BY detections.channel_id, detections.message_id
+),
+
+images AS (
+    SELECT
+        image_messages.channel_id,
+        image_messages.image_date,
+        message_detections.message_id IS NOT NULL AS has_detection,
+        COALESCE(message_detections.has_pill, FALSE) AS has_pill,
+        GREATEST(image_messages.loaded_at, message_detections.loaded_at) AS loaded_at
+    FROM image_messages
+    LEFT JOIN message_detections
+      ON message_detections.channel_id = image_messages.channel_id
+     AND message_detections.message_id = image_messages.message_id
+)
+
+SELECT
+    image_date,
+    channel_id,
+    COUNT(*) AS image_message_count,
+    COUNT(*) FILTER (WHERE has_detection) AS detected_message_count,
+    COUNT(*) FILTER (WHERE has_pill) AS pill_message_count,
+    MAX(loaded_at) AS last_loaded_at
+FROM images
+GROUP BY image_date, channel_id
@@ -1,11 +1,22 @@
 {{
   config(
-    materialized='table',
-    schema='mart'
+    materialized='incremental',
+    unique_key=['channel_id', 'message_id', 'image_filename', 'detected_object_class'],
+    incremental_strategy='delete+insert',
+    on_schema_change='append_new_columns',
+    schema='mart',
+    post_hook=[
+      "CREATE INDEX IF NOT EXISTS fct_image_detections_message_idx ON {{ this }} (channel_id, message_id)",
+      "CREATE INDEX IF NOT EXISTS fct_image_detections_loaded_at_idx ON {{ this }} (loaded_at)"
+    ]
   )
 }}
 
+-- Message ids are only unique within a channel, so detections join to their
+-- message on the channel in their relative path as well. Tables built before
+-- channel_id existed need one `dbt run --full-refresh -s fct_image_detections+`.
 SELECT
+    {{ detection_channel('detections.relative_path') }} AS channel_id,
     detections.message_id,
     detections.detected_object_class,
     detections.confidence_score,
@@ -17,4 +28,10 @@ SELECT
 FROM {{ ref('stg_image_detections') }} AS detections
 -- Optional join if you want to ensure message exists in fct_messages
 INNER JOIN {{ ref('fct_messages') }} AS messages
-  ON CAST(detections.message_id AS integer) = CAST(messages.message_id AS integer)
+  ON detections.message_id = messages.message_id
+ AND messages.channel_id = {{ detection_channel('detections.relative_path') }}
+{% if is_incremental() %}
+-- New detections, plus older ones whose message has only just arrived in fct_messages
+WHERE detections.loaded_at >= (SELECT COALESCE(MAX(loaded_at), '-infinity'::timestamp) FROM {{ this }})
+   OR messages.loaded_at >= (SELECT COALESCE(MAX(loaded_at), '-infinity'::timestamp) FROM {{ this }})
+{% endif %}
@@ -0,0 +1,70 @@
+-- models/marts/core/fct_keyword_mentions.sql
+
+{{ config(
+    materialized = 'incremental',
+    unique_key = ['mention_date', 'channel_id'],
+    incremental_strategy = 'delete+insert',
+    schema = 'mart',
+    pre_hook = """
+        {% if is_incremental() %}
+        DELETE FROM {{ this }}
+        WHERE (channel_id, mention_date) IN (
+            SELECT channel_id, DATE(message_timestamp)
+            FROM {{ ref('fct_messages') }}
+            WHERE loaded_at >= (SELECT COALESCE(MAX(last_loaded_at), '-infinity'::timestamp) FROM {{ this }})
+        )
+        {% endif %}
+    """,
+    post_hook = [
+        "CREATE INDEX IF NOT EXISTS fct_keyword_mentions_date_idx ON {{ this }} (mention_date, channel_id)"
+    ]
+) }}
+
+-- Daily keyword counts per channel. Incremental runs recount only the
+-- (channel, day) slices that received new or changed messages. delete+insert
+-- only replaces slices the recount still produces rows for, so the pre-hook
+-- clears every touched slice first: a slice whose messages no longer mention
+-- any known keyword must not keep its old counts. The watermark is then read
+-- from what is left, which recounts a few more slices but never fewer.
+WITH messages AS (
+    SELECT
+        channel_id,
+        DATE(message_timestamp) AS mention_date,
+        message_text,
+        loaded_at
+    FROM {{ ref('fct_messages') }}
+    WHERE message_text IS NOT NULL
+    {% if is_incremental() %}
+      AND (channel_id, DATE(message_timestamp)) IN (
+          SELECT channel_id, DATE(message_timestamp)
+          FROM {{ ref('fct_messages') }}
+          WHERE loaded_at >= (SELECT COALESCE(MAX(last_loaded_at), '-infinity'::timestamp) FROM {{ this }})
+      )
+    {% endif %}
+),
+
+tokens AS (
+    SELECT
+        channel_id,
+        mention_date,
+        loaded_at,
+        regexp_split_to_table(
+            regexp_replace(LOWER(message_text), '[^a-z0-9\s]', ' ', 'g'),
+            '\s+'
+        ) AS keyword
+    FROM messages
+)
+
+SELECT
+    mention_date,
+    channel_id,
+    keyword,
+    COUNT(*) AS mention_count,
+    MAX(loaded_at) AS last_loaded_at
+FROM tokens
+WHERE keyword IN (
+    {%- for keyword in var('known_keywords') %}
+    '{{ keyword }}'{% if not loop.last %},{% endif %}
+    {%- endfor %}
+)
+GROUP BY mention_date, channel_id, keyword
@@ -1,13 +1,27 @@
 -- models/marts/core/fct_messages.sql
 
 {{ config(
-    materialized = 'table',
-    schema = 'mart'
+    materialized = 'incremental',
+    unique_key = ['channel_id', 'message_id'],
+    incremental_strategy = 'delete+insert',
+    on_schema_change = 'append_new_columns',
+    schema = 'mart',
+    pre_hook = "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    post_hook = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS fct_messages_channel_message_idx ON {{ this }} (channel_id, message_id)",
+        "CREATE INDEX IF NOT EXISTS fct_messages_channel_timestamp_idx ON {{ this }} (channel_id, message_timestamp)",
+        "CREATE INDEX IF NOT EXISTS fct_messages_loaded_at_idx ON {{ this }} (loaded_at)",
+        "CREATE INDEX IF NOT EXISTS fct_messages_search_vector_idx ON {{ this }} USING GIN (search_vector)",
+        "CREATE INDEX IF NOT EXISTS fct_messages_message_text_trgm_idx ON {{ this }} USING GIN (message_text gin_trgm_ops)"
+    ]
 ) }}
 
 WITH base AS (
-    SELECT *
-    FROM {{ ref('stg_telegram_messages') }}
+    {% if is_incremental() %}
+    {{ latest_telegram_messages("(SELECT COALESCE(MAX(loaded_at), '-infinity'::timestamp) FROM " ~ this ~ ")") }}
+    {% else %}
+    {{ latest_telegram_messages() }}
+    {% endif %}
 )
 
 SELECT
@@ -20,5 +34,7 @@ SELECT
     view_count,
     has_image,
     message_length,
-    loaded_at
+    loaded_at,
+    -- Full-text search document; the API queries it with the same text search config
+    to_tsvector('{{ var("search_text_config") }}', COALESCE(message_text, '')) AS search_vector
 FROM base
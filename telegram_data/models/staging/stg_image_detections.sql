@@ -15,3 +15,7 @@ SELECT
     processed_at,
     loaded_at
 FROM {{ source('raw', 'image_detections') }}
+{% if var('processed_from', none) is not none %}
+-- Constant bound on the partition key, so the planner skips older monthly partitions
+WHERE processed_at >= '{{ var("processed_from") }}'::TIMESTAMP
+{% endif %}
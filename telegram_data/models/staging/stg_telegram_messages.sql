@@ -5,16 +5,23 @@
   )
 }}
 
+-- Filterable fields come from the typed columns written by the raw loader;
+-- only free text is still read out of the JSONB payload
 SELECT
-    message_data->>'message_id' AS message_id,
-    (message_data->>'timestamp')::TIMESTAMP AS message_timestamp,
+    id AS raw_id,
+    message_id,
+    message_timestamp,
     scrape_date,
     channel_name,
     message_data->>'message_content' AS message_text,
-    message_data->>'sender_id' AS sender_id,
-    (message_data->>'views')::INTEGER AS view_count,
+    sender_id,
+    views AS view_count,
     message_data->>'image_path' AS image_path,
-    CASE WHEN message_data->>'image_path' IS NOT NULL THEN TRUE ELSE FALSE END AS has_image,
+    has_image,
     LENGTH(message_data->>'message_content') AS message_length,
     loaded_at
-FROM {{ source('raw', 'telegram_messages') }}
\ No newline at end of file
+FROM {{ source('raw', 'telegram_messages') }}
+{% if var('scrape_date_from', none) is not none %}
+-- Constant bound on the partition key, so the planner skips older monthly partitions
+WHERE scrape_date >= '{{ var("scrape_date_from") }}'::DATE
+{% endif %}
@@ -0,0 +1,45 @@
+-- Returns rows where incremental fct_image_detections differs from what a full refresh would build
+WITH full_refresh AS (
+    SELECT
+        {{ detection_channel('detections.relative_path') }} AS channel_id,
+        detections.message_id,
+        detections.detected_object_class,
+        detections.confidence_score,
+        detections.image_filename,
+        detections.relative_path,
+        detections.processed_at,
+        detections.loaded_at
+    FROM {{ ref('stg_image_detections') }} AS detections
+    INNER JOIN {{ ref('fct_messages') }} AS messages
+      ON detections.message_id = messages.message_id
+     AND messages.channel_id = {{ detection_channel('detections.relative_path') }}
+),
+
+incremental AS (
+    SELECT
+        channel_id,
+        message_id,
+        detected_object_class,
+        confidence_score,
+        image_filename,
+        relative_path,
+        processed_at,
+        loaded_at
+    FROM {{ ref('fct_image_detections') }}
+),
+
+missing AS (
+    SELECT 'missing_from_incremental' AS difference, * FROM full_refresh
+    EXCEPT ALL
+    SELECT 'missing_from_incremental', * FROM incremental
+),
+
+extra AS (
+    SELECT 'extra_in_incremental' AS difference, * FROM incremental
+    EXCEPT ALL
+    SELECT 'extra_in_incremental', * FROM full_refresh
+)
+
+SELECT * FROM missing
+UNION ALL
+SELECT * FROM extra
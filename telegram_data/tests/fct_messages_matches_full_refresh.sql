@@ -0,0 +1,46 @@
+-- Returns rows where incremental fct_messages differs from what a full refresh would build
+WITH full_refresh AS (
+    SELECT
+        message_id,
+        message_timestamp,
+        scrape_date,
+        channel_name AS channel_id,
+        sender_id,
+        message_text,
+        view_count,
+        has_image,
+        message_length,
+        loaded_at
+    FROM ({{ latest_telegram_messages() }}) latest
+),
+
+incremental AS (
+    SELECT
+        message_id,
+        message_timestamp,
+        scrape_date,
+        channel_id,
+        sender_id,
+        message_text,
+        view_count,
+        has_image,
+        message_length,
+        loaded_at
+    FROM {{ ref('fct_messages') }}
+),
+
+missing AS (
+    SELECT 'missing_from_incremental' AS difference, * FROM full_refresh
+    EXCEPT ALL
+    SELECT 'missing_from_incremental', * FROM incremental
+),
+
+extra AS (
+    SELECT 'extra_in_incremental' AS difference, * FROM incremental
+    EXCEPT ALL
+    SELECT 'extra_in_incremental', * FROM full_refresh
+)
+
+SELECT * FROM missing
+UNION ALL
+SELECT * FROM extra
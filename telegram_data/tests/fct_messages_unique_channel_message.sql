@@ -0,0 +1,9 @@
+-- Returns (channel_id, message_id) pairs that appear more than once; message
+-- ids are only unique within a channel, so that pair is the model's key
+SELECT
+    channel_id,
+    message_id,
+    COUNT(*) AS row_count
+FROM {{ ref('fct_messages') }}
+GROUP BY channel_id, message_id
+HAVING COUNT(*) > 1
@@ -0,0 +1,10 @@
+-- Returns raw message keys that appear more than once; a message is stored
+-- once per channel and scrape_date, and its id repeats across channels
+SELECT
+    channel_name,
+    message_id,
+    scrape_date,
+    COUNT(*) AS row_count
+FROM {{ ref('stg_telegram_messages') }}
+GROUP BY channel_name, message_id, scrape_date
+HAVING COUNT(*) > 1
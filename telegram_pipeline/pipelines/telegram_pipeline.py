@@ -1,49 +1,139 @@
-from dagster import op, job, Definitions, ScheduleDefinition
-import subprocess
+from dagster import (
+    AssetSelection,
+    DailyPartitionsDefinition,
+    Definitions,
+    MaterializeResult,
+    asset,
+    build_schedule_from_partitioned_job,
+    define_asset_job,
+    multiprocess_executor,
+)
 import sys
-python_executable = sys.executable
-
-@op
-def scrape_telegram_data():
-    subprocess.run([python_executable, r".\scripts\data_scraping.py"], check=True)
-    return "done"
-
-@op
-def run_yolo_enrichment(_dbt_output):
-    subprocess.run([python_executable, r".\scripts\image_detection.py"], check=True)
-    return "yolo enriched"
-
-@op
-def load_raw_to_postgres(_scrape_output):
-    subprocess.run([python_executable, r".\scripts\load_raw_data.py"], check=True)
-    return "loaded"
-
-@op
-def load_detected_object_to_postgres(_yolo_output):
-    subprocess.run([python_executable, r".\scripts\load_detected_objects.py"], check=True)
-    return "loaded detected"
-
-@op
-def run_dbt_transformations(_load_output):
-    subprocess.run(["dbt", "run"], cwd="telegram_data", check=True)
-    return "dbt run complete"
-
-@job
-def telegram_pipeline_job():
-    # define order
-    scrape = scrape_telegram_data()
-    yolo = run_yolo_enrichment(scrape)
-    load = load_raw_to_postgres(yolo)
-    load_detect = load_detected_object_to_postgres(load)
-    run_dbt_transformations(load_detect)
-
-daily_pipeline_schedule = ScheduleDefinition(
-    job=telegram_pipeline_job,
-    cron_schedule="15 23 * * *",  
-    name="daily_data_pipeline_schedule"
+from pathlib import Path
+
+# The processing scripts are plain modules in scripts/; the pipeline runs from
+# the repository root so their relative data/ paths resolve as on the CLI
+SCRIPTS_DIR = Path(__file__).resolve().parents[2] / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+import instrumentation  # noqa: E402
+
+# One partition per day of Telegram posts (UTC), matching the
+# data/raw/telegram_messages/<YYYY-MM-DD>/ folders
+daily_partitions = DailyPartitionsDefinition(start_date="2025-07-01")
+
+# Concurrency pools (limit them in dagster.yaml, e.g. `concurrency: pools:
+# default_limit: 1`): the Telegram session file, the append-only detection
+# store and dbt's incremental models each allow one writer at a time.
+# Raw loads of different days run in parallel with each other, but never
+# alongside dbt: both loaders share a Postgres advisory lock that dbt_marts
+# takes exclusively (see scripts/raw_load_lock.py).
+TELEGRAM_POOL = "telegram_session"
+DETECTION_POOL = "detection_store"
+DBT_POOL = "dbt"
+
+def stage_result(context, collector, **metadata):
+    """The step's metadata plus every count and timing instrumentation recorded during it.
+
+    The same numbers are pushed to a Pushgateway when PROMETHEUS_PUSHGATEWAY is set.
+    """
+    instrumentation.push_metrics("telegram_pipeline", asset=context.asset_key.to_user_string(),
+                                 partition=context.partition_key)
+    return MaterializeResult(metadata={**metadata, **collector.metadata()})
+
+@asset(partitions_def=daily_partitions, pool=TELEGRAM_POOL)
+def telegram_messages(context) -> MaterializeResult:
+    """Messages and photos posted on the partition day, scraped to that day's folder."""
+    # Scripts are imported inside the assets so loading these definitions
+    # doesn't pull in Telethon, torch or psycopg2
+    from data_scraping import scrape_partition
+    with instrumentation.collect() as collector:
+        counts = scrape_partition(context.partition_key)
+    return stage_result(context, collector, new_messages=sum(counts.values()))
+
+@asset(partitions_def=daily_partitions, deps=[telegram_messages])
+def raw_telegram_messages(context) -> MaterializeResult:
+    """The partition day's message files loaded into raw.telegram_messages."""
+    from load_raw_data import RAW_DATA_ROOT, load_scraped_data
+    with instrumentation.collect() as collector:
+        stats = load_scraped_data(RAW_DATA_ROOT, workers=2, scrape_date=context.partition_key)
+    if stats["failed_files"]:
+        raise RuntimeError(f"{stats['failed_files']} files failed to load for {context.partition_key}")
+    return stage_result(context, collector, files=stats["files"], messages=stats["messages"])
+
+@asset(partitions_def=daily_partitions, deps=[telegram_messages], pool=DETECTION_POOL)
+def image_detections(context) -> MaterializeResult:
+    """YOLO detections for the partition day's photos, appended to the detection store."""
+    from image_detection import detect_objects
+    with instrumentation.collect() as collector:
+        detections = detect_objects(scrape_date=context.partition_key)
+    return stage_result(context, collector, new_detections=detections)
+
+@asset(partitions_def=daily_partitions, deps=[image_detections], pool=DETECTION_POOL)
+def raw_image_detections(context) -> MaterializeResult:
+    """Detections appended to the store since the last load, in raw.image_detections."""
+    from load_detected_objects import load_detections
+    with instrumentation.collect() as collector:
+        inserted = load_detections()
+    return stage_result(context, collector, inserted=inserted)
+
+@asset(partitions_def=daily_partitions, deps=[raw_telegram_messages, raw_image_detections], pool=DBT_POOL)
+def dbt_marts(context) -> MaterializeResult:
+    """Incremental dbt run over everything loaded since the previous run."""
+    from dbt.cli.main import dbtRunner
+    from load_raw_data import get_db_connection
+    from raw_load_lock import exclusive_raw_loads
+    project_dir = SCRIPTS_DIR.parent / "telegram_data"
+    conn = get_db_connection()
+    try:
+        with instrumentation.collect() as collector:
+            # No raw load may commit while dbt reads its loaded_at watermarks
+            with exclusive_raw_loads(conn), instrumentation.timed("dbt", "run"):
+                result = dbtRunner().invoke(["run", "--project-dir", str(project_dir)])
+            if not result.success:
+                raise RuntimeError(f"dbt run failed: {result.exception}")
+            rows_affected = {}
+            for node_result in result.result:
+                instrumentation.observe("dbt", node_result.node.name, node_result.execution_time)
+                # -1 for views (CREATE VIEW has no row count), so rows stay out of the counters
+                rows = (node_result.adapter_response or {}).get("rows_affected")
+                if rows is not None and rows >= 0:
+                    rows_affected[f"dbt.{node_result.node.name}_rows"] = rows
+    finally:
+        conn.close()
+    return stage_result(context, collector, models=len(result.result), **rows_affected)
+
+@asset(partitions_def=daily_partitions, deps=[dbt_marts], pool=DBT_POOL)
+def mart_version(context) -> MaterializeResult:
+    """Bumped marker that invalidates the API response cache; must follow the dbt run."""
+    from load_raw_data import get_db_connection
+    from publish_mart_version import publish_mart_version
+    conn = get_db_connection()
+    try:
+        version = publish_mart_version(conn)
+    finally:
+        conn.close()
+    return MaterializeResult(metadata={"version": version})
+
+# Steps run in separate processes, so the raw-load and detection branches of a
+# day overlap, and a backfill runs several days at once
+telegram_pipeline_job = define_asset_job(
+    "telegram_pipeline_job",
+    selection=AssetSelection.all(),
+    partitions_def=daily_partitions,
+    executor_def=multiprocess_executor.configured({"max_concurrent": 4}),
+)
+
+# Shortly after midnight UTC, once the previous day's partition is complete
+daily_pipeline_schedule = build_schedule_from_partitioned_job(
+    telegram_pipeline_job,
+    name="daily_data_pipeline_schedule",
+    hour_of_day=0,
+    minute_of_hour=15,
 )
 
 defs = Definitions(
+    assets=[telegram_messages, raw_telegram_messages, image_detections, raw_image_detections,
+            dbt_marts, mart_version],
     jobs=[telegram_pipeline_job],
     schedules=[daily_pipeline_schedule]
 )
@@ -0,0 +1,74 @@
+"""A stand-in for Telethon's TelegramClient, for exercising the scraper offline.
+
+Implements only what scripts/data_scraping.py calls: iter_messages and
+download_media. Both yield to the event loop between steps, so concurrent
+channels and downloads really interleave, and both record how many calls
+were in flight at once.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from telethon.tl.types import MessageMediaPhoto
+
+
+def make_messages(count, start=datetime(2025, 7, 14, tzinfo=timezone.utc), photo_every=2):
+    """`count` messages with ids 1..count, a minute apart; every `photo_every`-th carries a photo."""
+    return [
+        SimpleNamespace(
+            id=message_id,
+            date=start + timedelta(minutes=message_id),
+            sender_id=1000 + message_id,
+            text=f"message {message_id}",
+            views=message_id * 10,
+            media=MessageMediaPhoto() if photo_every and message_id % photo_every == 0 else None,
+        )
+        for message_id in range(1, count + 1)
+    ]
+
+
+class FakeTelegramClient:
+    """Serves fixed per-channel message lists; downloads write small fake JPEGs.
+
+    `failing_downloads` holds message ids whose download raises, like a
+    photo Telegram no longer serves.
+    """
+
+    def __init__(self, channels, failing_downloads=()):
+        self.channels = channels
+        self.failing_downloads = set(failing_downloads)
+        self.active_channels = 0
+        self.max_active_channels = 0
+        self.active_downloads = 0
+        self.max_active_downloads = 0
+        self.downloaded = []
+
+    async def iter_messages(self, channel, min_id=None, limit=None, offset_date=None):
+        self.active_channels += 1
+        self.max_active_channels = max(self.max_active_channels, self.active_channels)
+        try:
+            # Newest first, like Telegram
+            messages = sorted(self.channels[channel], key=lambda message: message.id, reverse=True)
+            if min_id is not None:
+                messages = [message for message in messages if message.id > min_id]
+            if offset_date is not None:
+                messages = [message for message in messages if message.date < offset_date]
+            for message in messages[:limit]:
+                await asyncio.sleep(0)
+                yield message
+        finally:
+            self.active_channels -= 1
+
+    async def download_media(self, message, path):
+        self.active_downloads += 1
+        self.max_active_downloads = max(self.max_active_downloads, self.active_downloads)
+        try:
+            await asyncio.sleep(0.001)
+            if message.id in self.failing_downloads:
+                raise ValueError(f"photo for message {message.id} is gone")
+            with open(path, 'wb') as f:
+                f.write(b'\xff\xd8\xff\xe0' + str(message.id).encode() + b'\xff\xd9')
+            self.downloaded.append(message.id)
+            return path
+        finally:
+            self.active_downloads -= 1
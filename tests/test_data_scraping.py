@@ -0,0 +1,100 @@
+"""Scraper tests against the fake client in fake_telegram.py (no Telegram account needed)."""
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import data_scraping  # noqa: E402
+from data_scraping import MediaDownloader, load_high_water_mark, scrape_channels  # noqa: E402
+from fake_telegram import FakeTelegramClient, make_messages  # noqa: E402
+
+SCRAPE_DATE = "2025-07-14"
+CHANNELS = ['@channel_a', '@channel_b', '@channel_c', '@channel_d', '@channel_e']
+
+
+def read_segments(channel_dir):
+    messages = []
+    for path in sorted(channel_dir.glob("*.jsonl")):
+        with open(path, encoding='utf-8') as f:
+            messages.extend(json.loads(line) for line in f if line.strip())
+    return messages
+
+
+def scrape(client, tmp_path, concurrency=2, download_concurrency=3):
+    async def run():
+        async with MediaDownloader(client, download_concurrency) as downloader:
+            return await scrape_channels(client, CHANNELS, SCRAPE_DATE, concurrency,
+                                         raw_dir=str(tmp_path / "raw"), state_dir=str(tmp_path / "state"),
+                                         downloader=downloader, segment_format="jsonl")
+    return asyncio.run(run())
+
+
+def test_scrape_channels_respects_concurrency_and_writes_files(tmp_path):
+    client = FakeTelegramClient({channel: make_messages(20) for channel in CHANNELS})
+
+    counts = scrape(client, tmp_path, concurrency=2, download_concurrency=3)
+
+    assert counts == {channel: 20 for channel in CHANNELS}
+    assert client.max_active_channels == 2
+    assert 1 <= client.max_active_downloads <= 3
+    for channel in CHANNELS:
+        channel_dir = tmp_path / "raw" / SCRAPE_DATE / channel.lstrip('@')
+        messages = {message['message_id']: message for message in read_segments(channel_dir)}
+        assert sorted(messages) == list(range(1, 21))
+        for message_id, message in messages.items():
+            image = channel_dir / "images" / f"{message_id}.jpg"
+            if message_id % 2 == 0:
+                assert message['image_path'] == str(image)
+                assert image.exists()
+            else:
+                assert 'image_path' not in message
+                assert not image.exists()
+        assert load_high_water_mark(channel.lstrip('@'), str(tmp_path / "raw"), str(tmp_path / "state")) == 20
+
+
+def test_rescrape_fetches_only_new_messages(tmp_path):
+    channels = {channel: make_messages(10) for channel in CHANNELS}
+    scrape(FakeTelegramClient(channels), tmp_path)
+
+    channels = {channel: make_messages(15) for channel in CHANNELS}
+    client = FakeTelegramClient(channels)
+    counts = scrape(client, tmp_path)
+
+    assert counts == {channel: 5 for channel in CHANNELS}
+    assert sorted(set(client.downloaded)) == [12, 14]
+    for channel in CHANNELS:
+        channel_dir = tmp_path / "raw" / SCRAPE_DATE / channel.lstrip('@')
+        assert sorted(message['message_id'] for message in read_segments(channel_dir)) == list(range(1, 16))
+        assert len(list(channel_dir.glob("*.jsonl"))) == 2
+
+
+def test_initial_fetch_is_limited(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_scraping, "INITIAL_FETCH_LIMIT", 5)
+    client = FakeTelegramClient({channel: make_messages(12) for channel in CHANNELS})
+
+    counts = scrape(client, tmp_path)
+
+    assert counts == {channel: 5 for channel in CHANNELS}
+    channel_dir = tmp_path / "raw" / SCRAPE_DATE / "channel_a"
+    assert sorted(message['message_id'] for message in read_segments(channel_dir)) == [8, 9, 10, 11, 12]
+
+
+def test_failed_photo_holds_back_high_water_mark_and_is_retried(tmp_path):
+    channels = {channel: make_messages(10) for channel in CHANNELS}
+    scrape(FakeTelegramClient(channels, failing_downloads={4}), tmp_path)
+
+    channel_dir = tmp_path / "raw" / SCRAPE_DATE / "channel_a"
+    assert load_high_water_mark("channel_a", str(tmp_path / "raw"), str(tmp_path / "state")) == 3
+    assert not (channel_dir / "images" / "4.jpg").exists()
+
+    client = FakeTelegramClient(channels)
+    counts = scrape(client, tmp_path)
+
+    # Only the message with the missing photo is written again
+    assert counts == {channel: 1 for channel in CHANNELS}
+    assert sorted(set(client.downloaded)) == [4]
+    assert (channel_dir / "images" / "4.jpg").exists()
+    assert load_high_water_mark("channel_a", str(tmp_path / "raw"), str(tmp_path / "state")) == 10